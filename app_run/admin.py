@@ -47,6 +47,17 @@ class PositionAdmin(ModelAdmin):
     ]
 
 
+@admin.register(models.RunTrack)
+class RunTrackAdmin(ModelAdmin):
+    list_display = [
+        "id",
+        "run",
+        "points_count",
+        "created_at",
+    ]
+    exclude = ["data"]
+
+
 @admin.register(models.Subscribe)
 class SubscribeAdmin(ModelAdmin):
     list_display = [
@@ -109,3 +120,43 @@ class CoachRateAdmin(admin.ModelAdmin):
         "athlete",
         "rating",
     ]
+
+
+@admin.register(models.UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "file_name",
+        "status",
+        "rows_processed",
+        "rows_rejected",
+        "created_at",
+        "finished_at",
+    ]
+    exclude = ["file_data"]
+
+
+@admin.register(models.AthleteStats)
+class AthleteStatsAdmin(admin.ModelAdmin):
+    list_display = [
+        "athlete",
+        "finished_runs",
+        "total_distance",
+        "total_time",
+        "best_speed",
+        "longest_run",
+        "last_run_at",
+    ]
+
+
+@admin.register(models.LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = [
+        "period",
+        "period_start",
+        "athlete",
+        "runs",
+        "distance",
+        "speed",
+    ]
+    list_filter = ["period"]
@@ -0,0 +1,78 @@
+import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.db.models import Avg, F, Max, Sum, Window
+from django.db.models.functions import FirstValue
+
+from .models import AthleteStats, Run, Subscribe
+from .stats import ATHLETE_STATS_VERSION
+from .versions import get_version, bump_version
+
+COACH_ANALYTICS_VERSION = "coach_analytics:{coach_id}"
+COACH_ANALYTICS_CACHE_KEY = "app_run:coach_analytics:{coach_id}:{versions}:{date_from}:{date_to}"
+COACH_ANALYTICS_CACHE_TIMEOUT = 60 * 60
+
+# Output key -> (athlete metric, top athlete key)
+COACH_ANALYTICS_METRICS = {
+    "longest_run_value": ("longest_run", "longest_run_user"),
+    "total_run_value": ("total_distance", "total_run_user"),
+    "speed_avg_value": ("avg_speed", "speed_avg_user"),
+}
+
+
+def _start_of_day(date: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(date, datetime.time.min, tzinfo=timezone.get_current_timezone())
+
+
+def _athlete_metrics(coach_id: int, date_from: datetime.date | None, date_to: datetime.date | None):
+    athletes = Subscribe.objects.filter(coach_id=coach_id).values("athlete_id")
+    if date_from is None and date_to is None:
+        return AthleteStats.objects.filter(athlete_id__in=athletes).annotate(
+            avg_speed=F("speed_sum") / F("finished_runs"),
+        )
+    runs = Run.objects.filter(athlete_id__in=athletes, status="finished")
+    # A run is dated by its last position, like in the stats and leaderboards: created_at is auto_now and
+    # changes on every save. Day bounds as datetimes keep the range on the (athlete, status, last_position_at) index.
+    if date_from is not None:
+        runs = runs.filter(last_position_at__gte=_start_of_day(date_from))
+    if date_to is not None:
+        runs = runs.filter(last_position_at__lt=_start_of_day(date_to + datetime.timedelta(days=1)))
+    return runs.values("athlete_id").annotate(
+        longest_run=Max("distance"),
+        total_distance=Sum("distance"),
+        avg_speed=Avg("speed"),
+    )
+
+
+def build_coach_analytics(coach_id: int, date_from=None, date_to=None) -> dict:
+    # Every window spans the whole per-athlete result, so any single row carries all the tops.
+    windows = {}
+    for value_key, (metric, user_key) in COACH_ANALYTICS_METRICS.items():
+        order_by = [F(metric).desc(), F("athlete_id").asc()]
+        windows[user_key] = Window(FirstValue("athlete_id"), order_by=order_by)
+        windows[value_key] = Window(FirstValue(metric), order_by=order_by)
+    rows = _athlete_metrics(coach_id, date_from, date_to).annotate(**windows).order_by().values(*windows)[:1]
+    return next(iter(rows), {})
+
+
+def get_coach_analytics_version(coach_id: int) -> int:
+    return get_version(COACH_ANALYTICS_VERSION.format(coach_id=coach_id))
+
+
+def invalidate_coach_analytics(coach_id: int) -> int:
+    return bump_version(COACH_ANALYTICS_VERSION.format(coach_id=coach_id))
+
+
+def get_coach_analytics(coach_id: int, date_from=None, date_to=None) -> dict:
+    cache_key = COACH_ANALYTICS_CACHE_KEY.format(
+        coach_id=coach_id,
+        versions=f"{get_version(ATHLETE_STATS_VERSION)}.{get_coach_analytics_version(coach_id)}",
+        date_from=date_from or "",
+        date_to=date_to or "",
+    )
+    data = cache.get(cache_key)
+    if data is None:
+        data = build_coach_analytics(coach_id, date_from, date_to)
+        cache.set(cache_key, data, COACH_ANALYTICS_CACHE_TIMEOUT)
+    return data
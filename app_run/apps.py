@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppRunConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_run'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metrics import instrument_serializers
+
+        instrument_serializers()
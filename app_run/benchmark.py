@@ -0,0 +1,289 @@
+import datetime
+import platform
+import time
+from itertools import cycle
+
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+
+from .analytics import invalidate_coach_analytics
+from .challenges import CHALLENGES_VERSION
+from .exporters import XLSX_CONTENT_TYPE, write_xlsx
+from .models import Run, Subscribe
+from .querycount import QueryRecorder
+from .services import create_positions_batch
+from .synthetic import CITY_LATITUDE, CITY_LONGITUDE, make_track
+from .versions import bump_version
+
+PERCENTILES = (50, 95, 99)
+INGEST_RUNS = 20
+BATCH_POINTS = 50
+STOP_POINTS = 100
+UPLOAD_ROWS = 100
+USERS_PAGE_SIZE = 50
+# Query counts barely move between runs, timings do, so they get separate tolerances.
+QUERY_TOLERANCE = 0.5
+
+SCENARIOS = {}
+
+
+class BenchmarkRequest:
+    __slots__ = ("method", "path", "kwargs", "items", "status", "prepare")
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        kwargs: dict | None = None,
+        items: int = 1,
+        status: int = 200,
+        prepare=None,
+    ):
+        self.method = method
+        self.path = path
+        self.kwargs = kwargs or {}
+        self.items = items
+        self.status = status
+        # Called right before the request, outside of the timing and the query count.
+        self.prepare = prepare
+
+
+class BenchmarkWorld:
+    def __init__(self, prefix: str, interval: int, seed: int = 0):
+        self.prefix = prefix
+        self.interval = interval
+        self.rng = np.random.default_rng(seed)
+        users = User.objects.filter(username__startswith=f"{prefix}_").order_by("id")
+        self.coaches = list(users.filter(is_staff=True).values_list("id", flat=True))
+        self.athletes = list(users.filter(is_staff=False).values_list("id", flat=True))
+        self.subscribed_coaches = sorted(
+            set(Subscribe.objects.filter(coach_id__in=self.coaches).values_list("coach_id", flat=True))
+        )
+
+    def create_runs(self, count: int, status: str) -> list[int]:
+        runs = Run.objects.bulk_create(
+            Run(athlete_id=athlete_id, comment=f"{self.prefix} benchmark", status=status)
+            for athlete_id, _ in zip(cycle(self.athletes), range(count))
+        )
+        return [run.pk for run in runs]
+
+    def create_tracked_runs(self, count: int, points: int) -> list[int]:
+        runs = Run.objects.filter(pk__in=self.create_runs(count, "in_progress")).order_by("id")
+        for run, track in zip(runs, self.tracks(count, points)):
+            for point in track:
+                point["date_time"] = datetime.datetime.fromisoformat(point["date_time"])
+            create_positions_batch(run, track, award_units=False)
+        return [run.pk for run in runs]
+
+    def tracks(self, runs: int, points: int):
+        backend = getattr(settings, "DISTANCE_BACKEND", None)
+        start = datetime.datetime.now(datetime.timezone.utc)
+        step = datetime.timedelta(seconds=self.interval)
+        for seed in self.rng.integers(0, 2 ** 32, runs).tolist():
+            latitudes, longitudes, *_ = make_track((seed, points, self.interval, backend))
+            yield [
+                {"latitude": latitude, "longitude": longitude, "date_time": (start + step * i).isoformat()}
+                for i, (latitude, longitude) in enumerate(zip(latitudes.tolist(), longitudes.tolist()))
+            ]
+
+
+def register_scenario(name: str):
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+
+    return decorator
+
+
+def json_post(path: str, data, items: int = 1, status: int = 201) -> BenchmarkRequest:
+    return BenchmarkRequest("post", path, {"data": data, "content_type": "application/json"}, items, status)
+
+
+@register_scenario("position_ingest")
+def position_ingest(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    # Points of several runs arrive interleaved, like from concurrently running athletes.
+    runs = world.create_runs(min(count, INGEST_RUNS), "in_progress")
+    tracks = list(world.tracks(len(runs), -(-count // len(runs))))
+    return [
+        json_post("/api/positions/", {"run": runs[i % len(runs)], **tracks[i % len(runs)][i // len(runs)]})
+        for i in range(count)
+    ]
+
+
+@register_scenario("position_batch")
+def position_batch(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    runs = world.create_runs(min(count, INGEST_RUNS), "in_progress")
+    batches = -(-count // len(runs))
+    tracks = list(world.tracks(len(runs), batches * BATCH_POINTS))
+    requests = []
+    for i in range(count):
+        start = i // len(runs) * BATCH_POINTS
+        points = tracks[i % len(runs)][start:start + BATCH_POINTS]
+        data = {"run": runs[i % len(runs)], "positions": points}
+        requests.append(json_post("/api/positions/batch/", data, items=BATCH_POINTS))
+    return requests
+
+
+@register_scenario("run_start")
+def run_start(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    return [BenchmarkRequest("post", f"/api/runs/{run_id}/start/") for run_id in world.create_runs(count, "init")]
+
+
+@register_scenario("run_stop")
+def run_stop(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    # Stopping does work per recorded point (distance, packed track), so the runs have real tracks.
+    return [
+        BenchmarkRequest("post", f"/api/runs/{run_id}/stop/", items=STOP_POINTS)
+        for run_id in world.create_tracked_runs(count, STOP_POINTS)
+    ]
+
+
+@register_scenario("users_list")
+def users_list(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    pages = max(1, -(-len(world.coaches + world.athletes) // USERS_PAGE_SIZE))
+    return [BenchmarkRequest("get", f"/api/users/?size={USERS_PAGE_SIZE}&page={i % pages + 1}") for i in range(count)]
+
+
+@register_scenario("users_retrieve")
+def users_retrieve(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    users = world.rng.choice(world.coaches + world.athletes, count).tolist()
+    return [BenchmarkRequest("get", f"/api/users/{user_id}/") for user_id in users]
+
+
+@register_scenario("challenges_summary")
+def challenges_summary(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    return [BenchmarkRequest("get", "/api/challenges_summary/") for _ in range(count)]
+
+
+@register_scenario("challenges_summary_cold")
+def challenges_summary_cold(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    # Every request follows an invalidation, as after a finished run, and has to rebuild the summary.
+    return [
+        BenchmarkRequest("get", "/api/challenges_summary/", prepare=lambda: bump_version(CHALLENGES_VERSION))
+        for _ in range(count)
+    ]
+
+
+@register_scenario("coach_analytics")
+def coach_analytics(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    coaches = cycle(world.subscribed_coaches)
+    return [BenchmarkRequest("get", f"/api/analytics_for_coach/{next(coaches)}/") for _ in range(count)]
+
+
+@register_scenario("coach_analytics_cold")
+def coach_analytics_cold(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    coaches = cycle(world.subscribed_coaches)
+    requests = []
+    for _ in range(count):
+        coach_id = next(coaches)
+        requests.append(BenchmarkRequest(
+            "get",
+            f"/api/analytics_for_coach/{coach_id}/",
+            prepare=lambda coach_id=coach_id: invalidate_coach_analytics(coach_id),
+        ))
+    return requests
+
+
+@register_scenario("collectible_upload")
+def collectible_upload(world: BenchmarkWorld, count: int) -> list[BenchmarkRequest]:
+    uids = world.rng.choice(2 ** 32, UPLOAD_ROWS, replace=False).tolist()
+    rows = [
+        (
+            f"{world.prefix} upload {i}",
+            f"{uid:08x}",
+            i % 100 + 1,
+            CITY_LATITUDE + world.rng.normal(0, 0.05),
+            CITY_LONGITUDE + world.rng.normal(0, 0.08),
+            f"https://example.com/units/{uid:08x}.png",
+        )
+        for i, uid in enumerate(uids)
+    ]
+    with write_xlsx("units", ["name", "uid", "value", "latitude", "longitude", "picture"], rows) as file:
+        content = file.read()
+    # Uploaded files are read by the view, every request needs its own.
+    return [
+        BenchmarkRequest(
+            "post",
+            "/api/upload_file/",
+            {"data": {"file": SimpleUploadedFile("units.xlsx", content, XLSX_CONTENT_TYPE)}},
+            items=UPLOAD_ROWS,
+        )
+        for _ in range(count)
+    ]
+
+
+def summarize(durations: list[float], queries: list[int], items: int, errors: int) -> dict:
+    durations_ms = np.array(durations) * 1000
+    total = float(np.sum(durations))
+    result = {"requests": len(durations), "errors": errors}
+    for percentile, value in zip(PERCENTILES, np.percentile(durations_ms, PERCENTILES).tolist()):
+        result[f"p{percentile}_ms"] = round(value, 3)
+    result.update({
+        "mean_ms": round(float(durations_ms.mean()), 3),
+        "throughput_rps": round(len(durations) / total, 1),
+        "items_per_second": round(items / total, 1),
+        "queries_mean": round(float(np.mean(queries)), 2),
+        "queries_max": int(np.max(queries)),
+    })
+    return result
+
+
+def run_scenario(client: Client, requests: list[BenchmarkRequest], warmup: int = 0) -> dict:
+    durations, queries, items, errors = [], [], 0, 0
+    for i, request in enumerate(requests):
+        if request.prepare:
+            request.prepare()
+        recorder = QueryRecorder()
+        with recorder.record():
+            start = time.perf_counter()
+            response = getattr(client, request.method)(request.path, **request.kwargs)
+            duration = time.perf_counter() - start
+        if i < warmup:
+            continue
+        durations.append(duration)
+        queries.append(recorder.count)
+        items += request.items
+        errors += response.status_code != request.status
+    return summarize(durations, queries, items, errors)
+
+
+def run_benchmark(world: BenchmarkWorld, scenarios, count: int, warmup: int = 0, on_result=None) -> dict:
+    client = Client()
+    results = {}
+    for name in scenarios:
+        results[name] = run_scenario(client, SCENARIOS[name](world, count + warmup), warmup)
+        if on_result:
+            on_result(name, results[name])
+    return results
+
+
+def describe_environment() -> dict:
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if result["errors"]:
+            regressions.append(f"{name}: {result['errors']} requests returned an unexpected status")
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms, baseline {previous['p95_ms']:.1f} ms")
+        if result["queries_mean"] > previous["queries_mean"] + QUERY_TOLERANCE:
+            regressions.append(
+                f"{name}: {result['queries_mean']} queries per request, baseline {previous['queries_mean']}"
+            )
+    return regressions
@@ -0,0 +1,118 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Challenge, Run
+from .versions import get_versions, bump_version, USERS_VERSION
+
+CHALLENGES_VERSION = "challenges"
+CHALLENGES_SUMMARY_CACHE_KEY = "app_run:challenges_summary:{versions}"
+CHALLENGES_SUMMARY_CACHE_TIMEOUT = 60 * 60
+
+# Metrics are aggregates over an athlete's finished runs, all of them are fetched in one query.
+METRICS = {
+    "finished_runs": Count("id"),
+    "total_distance": Coalesce(Sum("distance"), Value(0.0)),
+    "fast_2km_runs": Count("id", filter=Q(distance__gte=2.0, run_time_seconds__lt=610)),
+}
+
+
+class ChallengeRule:
+    def __init__(self, full_name: str, metric: str, threshold: float, strict: bool = False):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown challenge metric '{metric}'")
+        self.full_name = full_name
+        self.metric = metric
+        self.threshold = threshold
+        self.strict = strict
+
+    def is_achieved(self, stats: dict[str, float]) -> bool:
+        value = stats.get(self.metric) or 0
+        return value > self.threshold if self.strict else value >= self.threshold
+
+
+CHALLENGE_RULES: list[ChallengeRule] = []
+
+
+def register_rule(rule: ChallengeRule) -> ChallengeRule:
+    CHALLENGE_RULES.append(rule)
+    return rule
+
+
+register_rule(ChallengeRule("Сделай 10 Забегов!", "finished_runs", 10))
+register_rule(ChallengeRule("Пробеги 50 километров!", "total_distance", 50.0, strict=True))
+register_rule(ChallengeRule("Пробеги 2 километра меньше чем за 10 минут!", "fast_2km_runs", 1))
+
+
+def get_athlete_stats(athlete_ids=None) -> dict[int, dict[str, float]]:
+    metrics = {rule.metric for rule in CHALLENGE_RULES}
+    runs = Run.objects.filter(status="finished")
+    if athlete_ids is not None:
+        runs = runs.filter(athlete_id__in=athlete_ids)
+    rows = runs.values("athlete_id").annotate(**{metric: METRICS[metric] for metric in metrics}).order_by()
+    return {row.pop("athlete_id"): row for row in rows}
+
+
+def evaluate_challenges(athlete_ids=None) -> int:
+    achieved = {
+        (athlete_id, rule.full_name)
+        for athlete_id, stats in get_athlete_stats(athlete_ids).items()
+        for rule in CHALLENGE_RULES
+        if rule.is_achieved(stats)
+    }
+    if not achieved:
+        return 0
+    existing = set(
+        Challenge.objects
+        .filter(athlete_id__in={athlete_id for athlete_id, _ in achieved})
+        .values_list("athlete_id", "full_name")
+    )
+    awards = [
+        Challenge(athlete_id=athlete_id, full_name=full_name)
+        for athlete_id, full_name in sorted(achieved - existing)
+    ]
+    if awards:
+        # bulk_create skips signals, so the summary version is bumped here.
+        Challenge.objects.bulk_create(awards, ignore_conflicts=True)
+        bump_version(CHALLENGES_VERSION)
+    return len(awards)
+
+
+def build_challenges_summary() -> list[dict]:
+    rows = (
+        Challenge.objects
+        .order_by("full_name", "athlete_id")
+        .values_list(
+            "full_name",
+            "athlete_id",
+            "athlete__is_staff",
+            "athlete__first_name",
+            "athlete__last_name",
+            "athlete__username",
+        )
+    )
+    return [
+        {
+            "name_to_display": full_name,
+            "athletes": [
+                {"id": athlete_id, "full_name": f"{first_name} {last_name}", "username": username}
+                for _, athlete_id, is_staff, first_name, last_name, username in group
+                if not is_staff
+            ],
+        }
+        for full_name, group in groupby(rows.iterator(), key=itemgetter(0))
+    ]
+
+
+def get_challenges_summary() -> list[dict]:
+    # The summary shows athlete names, so a user change also makes it stale.
+    versions = get_versions([CHALLENGES_VERSION, USERS_VERSION])
+    cache_key = CHALLENGES_SUMMARY_CACHE_KEY.format(versions=".".join(map(str, versions)))
+    data = cache.get(cache_key)
+    if data is None:
+        data = build_challenges_summary()
+        cache.set(cache_key, data, CHALLENGES_SUMMARY_CACHE_TIMEOUT)
+    return data
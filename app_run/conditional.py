@@ -0,0 +1,67 @@
+import datetime
+import zlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .versions import get_or_create_versions, get_version_timeout, forget_versions
+
+CACHE_CONTROL_KEY = "app_run:cache_control:{path}:{etag}"
+
+
+def versioned_response(get_version_names, **cache_control):
+    """ETag and Last-Modified from cache version stamps, a matching conditional GET never reaches the database."""
+
+    def get_request_versions(request, kwargs) -> list[int]:
+        if not hasattr(request, "_versions"):
+            request._versions, request._created_versions = get_or_create_versions(get_version_names(**kwargs))
+        return request._versions
+
+    def etag(request, *args, **kwargs) -> str:
+        versions = get_request_versions(request, kwargs)
+        # Representations differ by renderer and query string, so both go into the tag.
+        variant = zlib.crc32(f"{request.META.get('HTTP_ACCEPT', '')}?{request.META.get('QUERY_STRING', '')}".encode())
+        return f"{'.'.join(map(str, versions))}-{variant:08x}"
+
+    def last_modified(request, *args, **kwargs) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(max(get_request_versions(request, kwargs)) / 1e9, tz=datetime.timezone.utc)
+
+    def cache_control_key(request, response) -> str:
+        return CACHE_CONTROL_KEY.format(path=zlib.crc32(request.path.encode()), etag=response["ETag"])
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            try:
+                response = conditional_view(request, *args, **kwargs)
+            except Exception:
+                # DRF turns e.g. Http404 into a response later, the stamps this request created are dropped the same.
+                forget_versions(getattr(request, "_created_versions", []))
+                raise
+            patch_vary_headers(response, ["Accept"])
+            if response.status_code == 200:
+                if not response.has_header("Cache-Control"):
+                    patch_cache_control(response, **cache_control)
+                elif response.has_header("ETag"):
+                    # A 304 must carry the same Cache-Control as the 200, but the view doesn't run for it.
+                    cache.set(cache_control_key(request, response), response["Cache-Control"], get_version_timeout())
+            elif response.status_code == 304:
+                view_cache_control = cache.get(cache_control_key(request, response))
+                if view_cache_control:
+                    response["Cache-Control"] = view_cache_control
+                else:
+                    patch_cache_control(response, **cache_control)
+            else:
+                # Errors (e.g. 404 for an unknown id) are not versioned and leave no stamps behind.
+                response.headers.pop("ETag", None)
+                response.headers.pop("Last-Modified", None)
+                forget_versions(getattr(request, "_created_versions", []))
+            return response
+
+        return inner
+
+    return decorator
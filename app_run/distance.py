@@ -0,0 +1,131 @@
+import numpy as np
+from django.conf import settings
+from geopy.distance import geodesic
+
+EARTH_RADIUS_KM = 6371.0088
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+VINCENTY_MAX_ITERATIONS = 200
+VINCENTY_TOLERANCE = 1e-12
+
+DEFAULT_BACKEND = "vincenty"
+
+
+def _as_arrays(*values) -> list[np.ndarray]:
+    return np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in values))
+
+
+def geodesic_distances(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = _as_arrays(lat1, lon1, lat2, lon2)
+    result = np.empty(lat1.shape, dtype=np.float64)
+    for index in np.ndindex(lat1.shape):
+        result[index] = geodesic((lat1[index], lon1[index]), (lat2[index], lon2[index])).km
+    return result
+
+
+def haversine_distances(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = map(np.radians, _as_arrays(lat1, lon1, lat2, lon2))
+    half_dlat = (lat2 - lat1) / 2
+    half_dlon = (lon2 - lon1) / 2
+    h = np.sin(half_dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(half_dlon) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def vincenty_distances(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = _as_arrays(lat1, lon1, lat2, lon2)
+    f = WGS84_F
+    u1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+    big_l = np.radians(lon2 - lon1)
+
+    lam = big_l.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(VINCENTY_MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(
+                cos_sq_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha
+            )
+            c = f / 16 * cos_sq_alpha * (4 + f * (4 - 3 * cos_sq_alpha))
+            lam_prev = lam
+            lam = big_l + (1 - c) * f * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam - lam_prev) < VINCENTY_TOLERANCE
+            if converged.all():
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = big_b * sin_sigma * (
+            cos_2sigma_m + big_b / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+            )
+        )
+        result = np.array(WGS84_B * big_a * (sigma - delta_sigma) / 1000, dtype=np.float64)
+
+    # Vincenty does not converge for nearly antipodal points, solve those exactly.
+    failed = ~converged | ~np.isfinite(result)
+    if failed.any():
+        result[failed] = geodesic_distances(lat1[failed], lon1[failed], lat2[failed], lon2[failed])
+    return result
+
+
+BACKENDS = {
+    "geodesic": geodesic_distances,
+    "haversine": haversine_distances,
+    "vincenty": vincenty_distances,
+}
+
+
+def get_backend(name: str | None = None):
+    name = name or getattr(settings, "DISTANCE_BACKEND", DEFAULT_BACKEND)
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown distance backend '{name}', expected one of {sorted(BACKENDS)}")
+
+
+def distances(lat1, lon1, lat2, lon2, backend: str | None = None) -> np.ndarray:
+    return get_backend(backend)(lat1, lon1, lat2, lon2)
+
+
+def segment_distances(latitudes, longitudes, backend: str | None = None) -> np.ndarray:
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if latitudes.size < 2:
+        return np.zeros(0, dtype=np.float64)
+    return distances(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:], backend)
+
+
+def track_distance(latitudes, longitudes, backend: str | None = None) -> float:
+    return float(segment_distances(latitudes, longitudes, backend).sum())
+
+
+def accuracy_report(latitudes, longitudes) -> dict[str, dict[str, float]]:
+    baseline = segment_distances(latitudes, longitudes, "geodesic")
+    report = {}
+    for name in BACKENDS:
+        values = segment_distances(latitudes, longitudes, name)
+        abs_error = np.abs(values - baseline) * 1000
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rel_error = np.where(baseline > 0, abs_error / (baseline * 1000), 0.0)
+        report[name] = {
+            "max_abs_error_m": float(abs_error.max(initial=0.0)),
+            "mean_abs_error_m": float(abs_error.mean()) if abs_error.size else 0.0,
+            "max_rel_error": float(rel_error.max(initial=0.0)),
+            "total_error_m": float(abs(values.sum() - baseline.sum()) * 1000),
+        }
+    return report
@@ -0,0 +1,103 @@
+import csv
+import datetime
+import tempfile
+
+import openpyxl
+
+from .models import Run, Position, RunTrack
+from .tracks import PackedTrack
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_CHUNK_SIZE = 5000
+XLSX_MAX_ROWS = 1_048_576
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+RUN_EXPORT_COLUMNS = (
+    "id",
+    "athlete_id",
+    "athlete__username",
+    "comment",
+    "status",
+    "created_at",
+    "distance",
+    "run_time_seconds",
+    "speed",
+)
+POSITION_EXPORT_COLUMNS = (
+    "run_id",
+    "id",
+    "latitude",
+    "longitude",
+    "date_time",
+    "speed",
+    "distance",
+)
+
+
+def get_export_runs(run_id: int | None = None, athlete_id: int | None = None, coach_id: int | None = None):
+    runs = Run.objects.order_by("id")
+    if run_id:
+        return runs.filter(pk=run_id)
+    if athlete_id:
+        return runs.filter(athlete_id=athlete_id)
+    if coach_id:
+        return runs.filter(athlete__athlete_subscribe__coach_id=coach_id)
+    return runs.none()
+
+
+def iter_run_rows(runs):
+    return runs.values_list(*RUN_EXPORT_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def iter_position_rows(runs):
+    run_ids = runs.values("id")
+    positions = (
+        Position.objects
+        .filter(run_id__in=run_ids)
+        .order_by("run_id", "id")
+        .values_list(*POSITION_EXPORT_COLUMNS)
+    )
+    yield from positions.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    # Archived runs keep their points in packed tracks, one blob at a time.
+    tracks = RunTrack.objects.filter(run_id__in=run_ids).order_by("run_id").values_list("run_id", "data")
+    for run_id, data in tracks.iterator(chunk_size=10):
+        for position in PackedTrack(data).positions(run_id):
+            yield tuple(getattr(position, column) for column in POSITION_EXPORT_COLUMNS)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header).encode("utf-8")
+    for row in rows:
+        yield writer.writerow(row).encode("utf-8")
+
+
+def _xlsx_value(value):
+    # Excel has no time zones, exports are in UTC.
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def write_xlsx(title: str, header, rows):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows, sheet_number = None, XLSX_MAX_ROWS, 0
+    for row in rows:
+        if sheet_rows >= XLSX_MAX_ROWS:
+            sheet_number += 1
+            sheet = workbook.create_sheet(title if sheet_number == 1 else f"{title}_{sheet_number}")
+            sheet.append(header)
+            sheet_rows = 1
+        sheet.append([_xlsx_value(value) for value in row])
+        sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet(title).append(header)
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
@@ -0,0 +1,148 @@
+from collections import defaultdict
+
+from rest_framework.fields import SerializerMethodField
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer
+
+from .metrics import timed_serialization
+from .models import Run, UnitAthleteRelation
+from .serializers import (
+    RunSerializer,
+    PositionSerializer,
+    UserSerializer,
+    UserRunSerializer,
+    UnitLocationSerializer,
+)
+
+
+class ValuesSerializer:
+    """Renders .values() rows exactly like serializer_class, field instances are bound once per request."""
+
+    serializer_class = None
+    # Columns needed by get_<field> methods, keyed by the field name.
+    method_columns: dict[str, tuple[str, ...]] = {}
+
+    def __init__(self, context=None, prefix: str = ""):
+        self.context = context or {}
+        self.prefix = prefix
+        self.fields = []
+        columns = []
+        for name, field in self.serializer_class(context=self.context).fields.items():
+            method = getattr(self, f"get_{name}", None)
+            if method is not None:
+                self.fields.append((name, None, method))
+                columns.extend(self.method_columns.get(name, ()))
+            elif isinstance(field, (SerializerMethodField, BaseSerializer)):
+                raise TypeError(f"{type(self).__name__} has no get_{name} for field '{name}'")
+            elif isinstance(field, PrimaryKeyRelatedField):
+                self.fields.append((name, prefix + f"{field.source}_id", None))
+            else:
+                self.fields.append((name, prefix + field.source.replace(".", "__"), field.to_representation))
+        self.columns = list(dict.fromkeys(
+            [column for _, column, _ in self.fields if column is not None]
+            + [prefix + column for column in columns]
+        ))
+
+    def prepare(self, queryset):
+        # Prefetches are replaced by load_related, select_related is meaningless for values().
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def load_related(self, rows: list[dict]) -> None:
+        pass
+
+    def to_representation(self, row: dict) -> dict:
+        data = {}
+        for name, column, to_representation in self.fields:
+            if column is None:
+                data[name] = to_representation(row)
+                continue
+            value = row[column]
+            # Like Serializer.to_representation, None is never passed to the field.
+            data[name] = value if value is None or to_representation is None else to_representation(value)
+        return data
+
+    @timed_serialization
+    def serialize(self, rows) -> list[dict]:
+        rows = list(rows)
+        self.load_related(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class RunValuesSerializer(ValuesSerializer):
+    serializer_class = RunSerializer
+    method_columns = {
+        "status": ("status",),
+        "athlete_data": ("athlete_id", "athlete__username", "athlete__last_name", "athlete__first_name"),
+    }
+    status_display = dict(Run.STATUS_CHOICES)
+
+    def get_status(self, row: dict) -> str:
+        return self.status_display.get(row["status"], row["status"])
+
+    def get_athlete_data(self, row: dict) -> dict:
+        return {
+            "id": row["athlete_id"],
+            "username": row["athlete__username"],
+            "last_name": row["athlete__last_name"],
+            "first_name": row["athlete__first_name"],
+        }
+
+
+class PositionValuesSerializer(ValuesSerializer):
+    serializer_class = PositionSerializer
+
+
+class UnitLocationValuesSerializer(ValuesSerializer):
+    serializer_class = UnitLocationSerializer
+
+
+class UserRunValuesSerializer(ValuesSerializer):
+    serializer_class = UserRunSerializer
+
+
+class UserValuesSerializer(ValuesSerializer):
+    serializer_class = UserSerializer
+    method_columns = {
+        "type": ("is_staff",),
+        "items": ("id",),
+        "rating": ("avg_rating",),
+        "runs": ("id",),
+    }
+
+    def __init__(self, context=None, prefix: str = ""):
+        super().__init__(context, prefix)
+        names = {name for name, _, _ in self.fields}
+        self.units = UnitLocationValuesSerializer(prefix="unit__") if "items" in names else None
+        self.runs = UserRunValuesSerializer() if "runs" in names else None
+        self.items_by_user = {}
+        self.runs_by_user = {}
+
+    def load_related(self, rows: list[dict]) -> None:
+        if self.units is None and self.runs is None:
+            # Without nested fields "id" may not even be among the requested columns.
+            return
+        user_ids = [row["id"] for row in rows]
+        if self.units is not None:
+            self.items_by_user = defaultdict(list)
+            relations = UnitAthleteRelation.objects.filter(athlete_id__in=user_ids)
+            for row in relations.values("athlete_id", *self.units.columns):
+                self.items_by_user[row["athlete_id"]].append(self.units.to_representation(row))
+        if self.runs is not None:
+            self.runs_by_user = defaultdict(list)
+            runs = Run.objects.filter(athlete_id__in=user_ids).order_by("id")
+            for row in runs.values("athlete_id", *self.runs.columns):
+                self.runs_by_user[row["athlete_id"]].append(self.runs.to_representation(row))
+
+    def get_type(self, row: dict) -> str:
+        return "coach" if row["is_staff"] else "athlete"
+
+    def get_items(self, row: dict) -> list[dict]:
+        return self.items_by_user.get(row["id"], [])
+
+    def get_rating(self, row: dict) -> float | None:
+        if row["avg_rating"]:
+            return float(row["avg_rating"])
+        return None
+
+    def get_runs(self, row: dict) -> list[dict]:
+        return self.runs_by_user.get(row["id"], [])
@@ -0,0 +1,134 @@
+import codecs
+import csv
+import datetime
+import os
+from itertools import islice
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Run
+from .services import create_positions_batch, finish_run
+
+IMPORT_FORMATS = ("gpx", "tcx", "csv")
+IMPORT_CHUNK_SIZE = 5000
+CSV_LATITUDE_COLUMNS = ("latitude", "lat")
+CSV_LONGITUDE_COLUMNS = ("longitude", "lon", "lng")
+CSV_TIME_COLUMNS = ("date_time", "time", "timestamp")
+
+
+class ImportStats:
+    def __init__(self):
+        self.points = 0
+        self.skipped = 0
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_point(latitude, longitude, date_time) -> dict | None:
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+        date_time = parse_datetime(date_time.strip())
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if date_time is None or not (-90.0 <= latitude <= 90.0) or not (-180.0 <= longitude <= 180.0):
+        return None
+    if date_time.tzinfo is None:
+        date_time = date_time.replace(tzinfo=datetime.timezone.utc)
+    return {"latitude": latitude, "longitude": longitude, "date_time": date_time}
+
+
+def _iter_xml_points(file, point_tag: str, read_point, stats: ImportStats):
+    # Detach every finished point from its parent so the tree never grows past one point.
+    parents = []
+    for event, element in iterparse(file, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local_name(element.tag) != point_tag:
+            continue
+        point = read_point(element)
+        if point:
+            yield point
+        else:
+            stats.skipped += 1
+        if parents:
+            parents[-1].remove(element)
+
+
+def _read_gpx_point(element) -> dict | None:
+    time = next((child.text for child in element if _local_name(child.tag) == "time"), None)
+    return _parse_point(element.get("lat"), element.get("lon"), time)
+
+
+def _read_tcx_point(element) -> dict | None:
+    values = {}
+    for child in element.iter():
+        name = _local_name(child.tag)
+        if name in ("Time", "LatitudeDegrees", "LongitudeDegrees"):
+            values[name] = child.text
+    return _parse_point(values.get("LatitudeDegrees"), values.get("LongitudeDegrees"), values.get("Time"))
+
+
+def _pick(row: dict, columns: tuple[str, ...]):
+    return next((row[column] for column in columns if row.get(column) not in (None, "")), None)
+
+
+def iter_gpx_points(file, stats: ImportStats):
+    return _iter_xml_points(file, "trkpt", _read_gpx_point, stats)
+
+
+def iter_tcx_points(file, stats: ImportStats):
+    return _iter_xml_points(file, "Trackpoint", _read_tcx_point, stats)
+
+
+def iter_csv_points(file, stats: ImportStats):
+    reader = csv.DictReader(codecs.iterdecode(file, "utf-8-sig"))
+    for row in reader:
+        row = {(key or "").strip().lower(): value for key, value in row.items()}
+        point = _parse_point(
+            _pick(row, CSV_LATITUDE_COLUMNS),
+            _pick(row, CSV_LONGITUDE_COLUMNS),
+            _pick(row, CSV_TIME_COLUMNS),
+        )
+        if point:
+            yield point
+        else:
+            stats.skipped += 1
+
+
+POINT_READERS = {
+    "gpx": iter_gpx_points,
+    "tcx": iter_tcx_points,
+    "csv": iter_csv_points,
+}
+
+
+def detect_format(file_name: str) -> str | None:
+    extension = os.path.splitext(file_name or "")[1].lstrip(".").lower()
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def import_run(athlete, file, file_format: str, comment: str = "", chunk_size: int = IMPORT_CHUNK_SIZE):
+    stats = ImportStats()
+    points = POINT_READERS[file_format](file, stats)
+    with transaction.atomic():
+        run = Run.objects.create(athlete=athlete, comment=comment, status="in_progress")
+        prev_position = None
+        try:
+            while chunk := list(islice(points, chunk_size)):
+                positions = create_positions_batch(run, chunk, prev_position, award_units=False)
+                prev_position = positions[-1]
+                stats.points += len(positions)
+        except ParseError as error:
+            raise ValueError(f"Malformed {file_format} file: {error}")
+        if not stats.points:
+            raise ValueError("File has no track points")
+        run.refresh_from_db()
+        finish_run(run)
+    return run, stats
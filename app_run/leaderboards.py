@@ -0,0 +1,175 @@
+import datetime
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from .models import LeaderboardEntry, Run
+
+LEADERBOARD_PERIODS = ("week", "month", "all")
+LEADERBOARD_METRICS = ("distance", "speed")
+ALL_TIME_START = datetime.date(1970, 1, 1)
+
+
+def get_period_start(period: str, date: datetime.date) -> datetime.date:
+    match period:
+        case "week":
+            return date - datetime.timedelta(days=date.weekday())
+        case "month":
+            return date.replace(day=1)
+        case _:
+            return ALL_TIME_START
+
+
+def get_run_date(run: Run) -> datetime.date:
+    return timezone.localdate(run.last_position_at or run.created_at or timezone.now())
+
+
+def record_leaderboard_run(run: Run) -> None:
+    date = get_run_date(run)
+    starts = {period: get_period_start(period, date) for period in LEADERBOARD_PERIODS}
+    # One UPDATE for all periods in the steady state, entries are only created when a period begins.
+    while missing := _increment_entries(run, starts):
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.bulk_create(
+                    LeaderboardEntry(
+                        period=period,
+                        period_start=starts[period],
+                        athlete_id=run.athlete_id,
+                        runs=1,
+                        distance=run.distance,
+                        speed_sum=run.speed,
+                        speed=run.speed,
+                    )
+                    for period in missing
+                )
+            return
+        except IntegrityError:
+            # A concurrent run created some of them, the next pass counts this run on top of those.
+            starts = {period: starts[period] for period in missing}
+
+
+def _increment_entries(run: Run, starts: dict[str, datetime.date]) -> list[str]:
+    buckets = Q()
+    for period, period_start in starts.items():
+        buckets |= Q(period=period, period_start=period_start)
+    entries = LeaderboardEntry.objects.filter(buckets, athlete_id=run.athlete_id)
+    updated = entries.update(
+        runs=F("runs") + 1,
+        distance=F("distance") + run.distance,
+        speed_sum=F("speed_sum") + run.speed,
+        speed=(F("speed_sum") + run.speed) / (F("runs") + 1),
+    )
+    if updated == len(starts):
+        return []
+    existing = set(entries.values_list("period", flat=True))
+    return [period for period in starts if period not in existing]
+
+
+def remove_leaderboard_run(run: Run, athlete_id: int) -> None:
+    date = get_run_date(run)
+    buckets = Q()
+    for period in LEADERBOARD_PERIODS:
+        buckets |= Q(period=period, period_start=get_period_start(period, date))
+    entries = LeaderboardEntry.objects.filter(buckets, athlete_id=athlete_id)
+    entries.update(
+        runs=F("runs") - 1,
+        distance=F("distance") - run.distance,
+        speed_sum=F("speed_sum") - run.speed,
+        speed=Case(When(runs__gt=1, then=(F("speed_sum") - run.speed) / (F("runs") - 1)), default=0.0),
+    )
+    entries.filter(runs__lte=0).delete()
+
+
+def rebuild_leaderboards(chunk_size: int = 1000) -> int:
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    runs = Run.objects.filter(status="finished").values_list(
+        "athlete_id", "distance", "speed", "last_position_at", "created_at"
+    )
+    for athlete_id, distance, speed, last_position_at, created_at in runs.iterator(chunk_size=chunk_size):
+        date = timezone.localdate(last_position_at or created_at)
+        for period in LEADERBOARD_PERIODS:
+            total = totals[(period, get_period_start(period, date), athlete_id)]
+            total[0] += 1
+            total[1] += distance
+            total[2] += speed
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(
+        (
+            LeaderboardEntry(
+                period=period,
+                period_start=period_start,
+                athlete_id=athlete_id,
+                runs=count,
+                distance=distance,
+                speed_sum=speed_sum,
+                speed=speed_sum / count,
+            )
+            for (period, period_start, athlete_id), (count, distance, speed_sum) in totals.items()
+        ),
+        batch_size=chunk_size,
+    )
+    return len(totals)
+
+
+def get_leaderboard_entries(period: str, period_start: datetime.date, coach_id: int | None = None):
+    entries = LeaderboardEntry.objects.filter(period=period, period_start=period_start)
+    if coach_id is not None:
+        entries = entries.filter(athlete__athlete_subscribe__coach_id=coach_id)
+    return entries
+
+
+def get_leaderboard(
+    period: str,
+    metric: str,
+    date: datetime.date | None = None,
+    coach_id: int | None = None,
+    athlete_id: int | None = None,
+    limit: int = 10,
+) -> dict:
+    period_start = get_period_start(period, date or timezone.localdate())
+    entries = get_leaderboard_entries(period, period_start, coach_id)
+    rows = list(
+        entries
+        .order_by(F(metric).desc(), "athlete_id")
+        .values("athlete_id", "athlete__username", "athlete__first_name", "athlete__last_name", "runs", metric)
+        [:limit]
+    )
+    top, rank, prev_score = [], 0, None
+    for position, row in enumerate(rows, start=1):
+        if row[metric] != prev_score:
+            rank, prev_score = position, row[metric]
+        top.append(_leaderboard_row(row, metric, rank))
+
+    me = None
+    if athlete_id is not None:
+        me = next((row for row in top if row["athlete_id"] == athlete_id), None)
+        if me is None:
+            row = (
+                entries.filter(athlete_id=athlete_id)
+                .values("athlete_id", "athlete__username", "athlete__first_name", "athlete__last_name", "runs", metric)
+                .first()
+            )
+            if row is not None:
+                rank = entries.filter(**{f"{metric}__gt": row[metric]}).count() + 1
+                me = _leaderboard_row(row, metric, rank)
+    return {
+        "period": period,
+        "period_start": period_start,
+        "metric": metric,
+        "top": top,
+        "me": me,
+    }
+
+
+def _leaderboard_row(row: dict, metric: str, rank: int) -> dict:
+    return {
+        "rank": rank,
+        "athlete_id": row["athlete_id"],
+        "username": row["athlete__username"],
+        "full_name": f"{row['athlete__first_name']} {row['athlete__last_name']}",
+        "runs": row["runs"],
+        "score": row[metric],
+    }
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from app_run.benchmark import SCENARIOS, BenchmarkWorld, run_benchmark, describe_environment, compare
+from app_run.synthetic import WorldGenerator
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "benchmark_baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет основные сценарии API через тестовый клиент на сгенерированных данных во временной базе, "
+        "пишет p50/p95/p99, пропускную способность и число запросов к БД в JSON и сравнивает с эталоном"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--coaches", type=int, default=10, help="количество тренеров")
+        parser.add_argument("--athletes", type=int, default=200, help="количество бегунов")
+        parser.add_argument("--runs", type=int, default=5, help="забегов на бегуна")
+        parser.add_argument("--points", type=int, default=200, help="точек в забеге")
+        parser.add_argument("--interval", type=int, default=5, help="секунд между точками")
+        parser.add_argument("--units", type=int, default=200, help="количество предметов на карте")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--requests", type=int, default=200, help="замеряемых запросов в сценарии")
+        parser.add_argument("--warmup", type=int, default=10, help="незамеряемых запросов перед замером")
+        parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="сценарий, по умолчанию все")
+        parser.add_argument("--output", help="куда записать результаты в JSON")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="эталонный JSON для сравнения")
+        parser.add_argument("--no-baseline", action="store_true", help="не сравнивать с эталоном")
+        parser.add_argument("--threshold", type=float, default=0.25, help="допустимый рост p95, доля")
+
+    def handle(self, *args, **options):
+        dataset = {
+            name: options[name] for name in ("coaches", "athletes", "runs", "points", "interval", "units", "seed")
+        }
+        # Own database and cache, so the numbers don't depend on (or touch) existing data.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                DEBUG=False,
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench"}},
+            ):
+                WorldGenerator(**dataset, prefix="bench").generate()
+                world = BenchmarkWorld("bench", options["interval"], options["seed"])
+                self.stdout.write(
+                    f"{'scenario':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} "
+                    f"{'items/s':>9} {'queries':>8} {'errors':>6}"
+                )
+                results = run_benchmark(
+                    world,
+                    options["scenario"] or list(SCENARIOS),
+                    options["requests"],
+                    options["warmup"],
+                    on_result=self.write_result,
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            "environment": describe_environment(),
+            "dataset": dataset,
+            "requests": options["requests"],
+            "scenarios": results,
+        }
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}")
+        if options["no_baseline"]:
+            return
+        self.check_baseline(results, Path(options["baseline"]), options["threshold"])
+
+    def write_result(self, name: str, result: dict) -> None:
+        self.stdout.write(
+            f"{name:<24} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+            f"{result['throughput_rps']:>8.1f} {result['items_per_second']:>9.1f} "
+            f"{result['queries_mean']:>8.2f} {result['errors']:>6}"
+        )
+
+    def check_baseline(self, results: dict, path: Path, threshold: float) -> None:
+        baseline = {}
+        if path.exists():
+            baseline = json.loads(path.read_text())["scenarios"]
+        else:
+            self.stdout.write(self.style.WARNING(f"No baseline at {path}, only errors are checked"))
+        regressions = compare(results, baseline, threshold)
+        if regressions:
+            raise CommandError("Regressions against baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path}"))
@@ -0,0 +1,42 @@
+import timeit
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app_run.distance import BACKENDS, accuracy_report, segment_distances
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость и точность бэкендов расчёта дистанции на синтетическом треке"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=7200, help="количество точек трека")
+        parser.add_argument("--repeat", type=int, default=5, help="количество повторов замера")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        latitudes, longitudes = self.make_track(options["points"], options["seed"])
+        report = accuracy_report(latitudes, longitudes)
+        self.stdout.write(f"track: {len(latitudes)} points")
+        self.stdout.write(
+            f"{'backend':<10} {'best ms':>10} {'max err m':>12} {'max rel err':>12} {'total err m':>12}"
+        )
+        for name in BACKENDS:
+            timer = timeit.Timer(lambda: segment_distances(latitudes, longitudes, name))
+            repeat = 1 if name == "geodesic" else options["repeat"]
+            best = min(timer.repeat(repeat=repeat, number=1)) * 1000
+            accuracy = report[name]
+            self.stdout.write(
+                f"{name:<10} {best:>10.2f} {accuracy['max_abs_error_m']:>12.6f} "
+                f"{accuracy['max_rel_error']:>12.2e} {accuracy['total_error_m']:>12.4f}"
+            )
+
+    @staticmethod
+    def make_track(points: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+        # ~3 m/s random walk sampled at 1 Hz around Moscow
+        rng = np.random.default_rng(seed)
+        heading = np.cumsum(rng.normal(0, 0.2, points))
+        step = 3 / 111_320
+        latitudes = 55.75 + np.cumsum(np.cos(heading) * step)
+        longitudes = 37.62 + np.cumsum(np.sin(heading) * step / np.cos(np.radians(55.75)))
+        return latitudes, longitudes
@@ -0,0 +1,110 @@
+import datetime
+import timeit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from app_run.models import Run, Position, UnitLocation, UnitAthleteRelation, CoachRate
+from app_run.views import RunViewSet, UserReadOnlyViewSet, PositionViewSet
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость списков через сериализаторы DRF и через values(), проверяет совпадение ответов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500, help="количество пользователей")
+        parser.add_argument("--runs", type=int, default=2000, help="количество забегов")
+        parser.add_argument("--positions", type=int, default=20000, help="количество точек")
+        parser.add_argument("--repeat", type=int, default=5, help="количество повторов замера")
+
+    def handle(self, *args, **options):
+        # The data only lives inside this transaction.
+        with transaction.atomic():
+            self.make_data(options["users"], options["runs"], options["positions"])
+            self.stdout.write(f"{'endpoint':<10} {'rows':>7} {'drf ms':>10} {'values ms':>10} {'speedup':>8} {'same':>5}")
+            for name, viewset in (("runs", RunViewSet), ("users", UserReadOnlyViewSet), ("positions", PositionViewSet)):
+                self.benchmark(name, viewset, options["repeat"])
+            transaction.set_rollback(True)
+
+    def benchmark(self, name: str, viewset, repeat: int) -> None:
+        view = viewset()
+        view.request = Request(APIRequestFactory().get(f"/api/{name}/"))
+        view.action = "list"
+        view.format_kwarg = None
+        queryset = view.filter_queryset(view.get_queryset())
+        context = view.get_serializer_context()
+        renderer = JSONRenderer()
+
+        def drf() -> bytes:
+            return renderer.render(view.get_serializer(list(queryset.all()), many=True).data)
+
+        def values() -> bytes:
+            serializer = view.values_serializer_class(context=context)
+            return renderer.render(serializer.serialize(serializer.prepare(queryset.all())))
+
+        same = drf() == values()
+        drf_ms = min(timeit.repeat(drf, repeat=repeat, number=1)) * 1000
+        values_ms = min(timeit.repeat(values, repeat=repeat, number=1)) * 1000
+        self.stdout.write(
+            f"{name:<10} {queryset.count():>7} {drf_ms:>10.1f} {values_ms:>10.1f} "
+            f"{drf_ms / values_ms:>7.1f}x {'yes' if same else 'NO':>5}"
+        )
+
+    def make_data(self, users: int, runs: int, positions: int) -> None:
+        prefix = f"bench{datetime.datetime.now():%H%M%S%f}"
+        users = User.objects.bulk_create(
+            User(username=f"{prefix}_{i}", first_name=f"Name{i}", last_name=f"Last{i}", is_staff=i % 10 == 0)
+            for i in range(users)
+        )
+        coaches = [user for user in users if user.is_staff]
+        units = UnitLocation.objects.bulk_create(
+            UnitLocation(
+                name=f"unit {i}",
+                uid=f"{i:08x}",
+                latitude=55.7 + i / 1000,
+                longitude=37.6,
+                picture=f"https://example.com/{i}.png",
+                value=i,
+            )
+            for i in range(100)
+        )
+        UnitAthleteRelation.objects.bulk_create(
+            UnitAthleteRelation(athlete=user, unit=units[(i * 7 + k) % len(units)])
+            for i, user in enumerate(users)
+            for k in range(i % 4)
+        )
+        CoachRate.objects.bulk_create(
+            CoachRate(coach=coaches[i % len(coaches)], athlete=user, rating=i % 5 + 1)
+            for i, user in enumerate(users)
+            if coaches and not user.is_staff
+        )
+        runs = Run.objects.bulk_create(
+            Run(
+                athlete=users[i % len(users)],
+                comment=f"run {i}",
+                status=("init", "in_progress", "finished")[i % 3],
+                distance=i / 7,
+                run_time_seconds=i,
+                speed=i / 13,
+            )
+            for i in range(runs)
+        )
+        start = datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)
+        Position.objects.bulk_create(
+            (
+                Position(
+                    run=runs[i % len(runs)],
+                    latitude=55.75 + i / 100000,
+                    longitude=37.62 - i / 100000,
+                    date_time=start + datetime.timedelta(seconds=i, microseconds=i * 37 % 1000000),
+                    speed=i % 7 / 3,
+                    distance=i / 1000,
+                )
+                for i in range(positions)
+            ),
+            batch_size=5000,
+        )
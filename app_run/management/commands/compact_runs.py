@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from app_run.models import Run
+from app_run.tracks import compact_run
+
+
+class Command(BaseCommand):
+    help = "Упаковывает точки завершённых забегов в бинарный трек и удаляет строки Position"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", type=int, action="append", dest="runs", help="id забега, можно несколько")
+        parser.add_argument("--limit", type=int, default=None, help="максимум забегов за запуск")
+
+    def handle(self, *args, **options):
+        runs = Run.objects.filter(status="finished", track__isnull=True, position__isnull=False).distinct()
+        if options["runs"]:
+            runs = runs.filter(pk__in=options["runs"])
+        run_ids = list(runs.order_by("id").values_list("id", flat=True)[:options["limit"]])
+        compacted = points = 0
+        for run in Run.objects.filter(pk__in=run_ids).order_by("id").iterator():
+            try:
+                track = compact_run(run)
+            except ValueError as error:
+                self.stderr.write(f"run {run.id}: {error}")
+                continue
+            if track:
+                compacted += 1
+                points += track.points_count
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} runs, {points} points"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from app_run.challenges import evaluate_challenges
+from app_run.models import Run
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает челленджи всех бегунов, например после добавления нового правила"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="бегунов за один запрос")
+
+    def handle(self, *args, **options):
+        athlete_ids = (
+            Run.objects.filter(status="finished")
+            .order_by("athlete_id")
+            .values_list("athlete_id", flat=True)
+            .distinct()
+        )
+        batch, athletes, awards = [], 0, 0
+        for athlete_id in athlete_ids.iterator(chunk_size=options["batch_size"]):
+            batch.append(athlete_id)
+            if len(batch) >= options["batch_size"]:
+                awards += evaluate_challenges(batch)
+                athletes += len(batch)
+                batch = []
+        if batch:
+            awards += evaluate_challenges(batch)
+            athletes += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Evaluated {athletes} athletes, {awards} achieved challenges"))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from app_run.synthetic import WorldGenerator
+
+
+class Command(BaseCommand):
+    help = "Генерирует тестовый мир: тренеров, бегунов, подписки, оценки, забеги с GPS-треками и предметы"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--coaches", type=int, default=10, help="количество тренеров")
+        parser.add_argument("--athletes", type=int, default=100, help="количество бегунов")
+        parser.add_argument("--runs", type=int, default=10, help="забегов на бегуна")
+        parser.add_argument("--points", type=int, default=720, help="точек в забеге")
+        parser.add_argument("--interval", type=int, default=5, help="секунд между точками")
+        parser.add_argument("--units", type=int, default=200, help="количество предметов на карте")
+        parser.add_argument("--days", type=int, default=90, help="за сколько последних дней раскидать забеги")
+        parser.add_argument("--workers", type=int, default=0, help="процессов для генерации треков, 0 - без пула")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="строк в одном bulk_create")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="gen", help="префикс имён пользователей")
+
+    def handle(self, *args, **options):
+        generator = WorldGenerator(
+            coaches=options["coaches"],
+            athletes=options["athletes"],
+            runs=options["runs"],
+            points=options["points"],
+            interval=options["interval"],
+            units=options["units"],
+            days=options["days"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            on_progress=self.report_progress,
+        )
+        stats = generator.generate()
+        for step, seconds in stats.seconds.items():
+            self.stdout.write(f"{step:<16} {seconds:>8.1f} s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats.users} users, {stats.units} units, {stats.runs} runs, {stats.positions} positions"
+        ))
+
+    def report_progress(self, stats) -> None:
+        self.stderr.write(f"\r{stats.runs} runs, {stats.positions} positions", ending="")
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_run.importers import IMPORT_FORMATS, IMPORT_CHUNK_SIZE, detect_format, import_run
+
+
+class Command(BaseCommand):
+    help = "Импортирует забеги из GPX, TCX или CSV файлов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="пути к файлам")
+        parser.add_argument("--athlete", type=int, required=True, help="id бегуна")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, default=None, help="формат, по умолчанию по расширению")
+        parser.add_argument("--comment", default="", help="комментарий к забегам")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        athlete = User.objects.filter(pk=options["athlete"]).first()
+        if not athlete:
+            raise CommandError(f"User {options['athlete']} does not exist")
+        for path in options["files"]:
+            file_format = options["format"] or detect_format(path)
+            if not file_format:
+                self.stderr.write(f"{path}: can't detect file format")
+                continue
+            with open(path, "rb") as file:
+                try:
+                    run, stats = import_run(athlete, file, file_format, options["comment"], options["chunk_size"])
+                except ValueError as error:
+                    self.stderr.write(f"{path}: {error}")
+                    continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: run {run.id}, {stats.points} points, {stats.skipped} skipped, {run.distance} km"
+            ))
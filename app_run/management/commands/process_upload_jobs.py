@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_run.uploads import claim_upload_job, process_upload_job
+
+
+class Command(BaseCommand):
+    help = "Обрабатывает очередь задач загрузки коллекционных предметов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="обработать очередь и завершиться")
+        parser.add_argument("--sleep", type=float, default=2.0, help="пауза между опросами очереди, сек")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_upload_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+                continue
+            job = process_upload_job(job)
+            self.stdout.write(
+                f"job {job.id} {job.status}: {job.rows_processed} rows, {job.rows_rejected} rejected"
+            )
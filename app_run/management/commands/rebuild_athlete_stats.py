@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_run.stats import rebuild_athlete_stats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает статистику бегунов по завершённым забегам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--athlete", type=int, action="append", dest="athletes", help="id бегуна, можно несколько")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="строк статистики за один запрос")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuilt = rebuild_athlete_stats(options["athletes"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {rebuilt} athletes"))
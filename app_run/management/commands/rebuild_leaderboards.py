@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_run.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает недельные, месячные и общие рейтинги по завершённым забегам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="строк за один запрос")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            entries = rebuild_leaderboards(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {entries} leaderboard entries"))
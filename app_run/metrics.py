@@ -0,0 +1,138 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from rest_framework.serializers import BaseSerializer
+
+# Fixed buckets keep memory per route constant, metrics are per process.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+UNMATCHED_ROUTE = "unmatched"
+METRICS_ROUTE = "metrics"
+
+HISTOGRAMS = {
+    "http_request_duration_seconds": ("Request latency in seconds", LATENCY_BUCKETS),
+    "http_request_db_seconds": ("Time spent in database queries per request", LATENCY_BUCKETS),
+    "http_request_serializer_seconds": ("Time spent in serializers per request", LATENCY_BUCKETS),
+    "http_response_size_bytes": ("Response body size in bytes", SIZE_BUCKETS),
+}
+COUNTERS = {
+    "http_requests_total": "Requests by route, method and status",
+}
+METRIC_PREFIX = "app_run_"
+
+_serializer_timer: ContextVar[list | None] = ContextVar("serializer_timer", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str, str], Histogram] = {}
+        self._counters: dict[tuple[str, str, str, int], int] = {}
+
+    def observe(self, name: str, route: str, method: str, value: float) -> None:
+        key = (name, route, method)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def increment(self, name: str, route: str, method: str, status: int) -> None:
+        key = (name, route, method, status)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (help_text, _) in HISTOGRAMS.items():
+            lines += [f"# HELP {METRIC_PREFIX}{name} {help_text}", f"# TYPE {METRIC_PREFIX}{name} histogram"]
+            for (metric, route, method), (counts, total, count, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                labels = f'route="{route}",method="{method}"'
+                cumulative = 0
+                for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_PREFIX}{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{METRIC_PREFIX}{name}_sum{{{labels}}} {total}")
+                lines.append(f"{METRIC_PREFIX}{name}_count{{{labels}}} {count}")
+        for name, help_text in COUNTERS.items():
+            lines += [f"# HELP {METRIC_PREFIX}{name} {help_text}", f"# TYPE {METRIC_PREFIX}{name} counter"]
+            for (metric, route, method, status), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{METRIC_PREFIX}{name}{{route="{route}",method="{method}",status="{status}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def get_route(request) -> str:
+    match = request.resolver_match
+    return match.view_name if match and match.view_name else UNMATCHED_ROUTE
+
+
+def get_method(request) -> str:
+    return request.method if request.method in METHODS else "OTHER"
+
+
+@contextmanager
+def serializer_timer():
+    timer = [0.0, 0]
+    token = _serializer_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _serializer_timer.reset(token)
+
+
+def timed_serialization(func):
+    # Only the outermost serializer is timed, nested ones (e.g. inside a method field) are part of it.
+    @wraps(func)
+    def inner(*args, **kwargs):
+        timer = _serializer_timer.get()
+        if timer is None or timer[1]:
+            return func(*args, **kwargs)
+        timer[1] += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer[0] += time.perf_counter() - start
+            timer[1] -= 1
+
+    return inner
+
+
+def instrument_serializers() -> None:
+    data = BaseSerializer.data
+    if not getattr(data.fget, "__wrapped__", None):
+        BaseSerializer.data = property(timed_serialization(data.fget))
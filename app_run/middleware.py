@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.conf import settings
+
+from .metrics import METRICS_ROUTE, registry, get_route, get_method, serializer_timer
+from .querycount import QueryBudgetExceeded, QueryRecorder, get_query_budget
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+        request.query_recorder = recorder
+        budget = get_query_budget()
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        max_queries = budget["VIEWS"].get(view_name, budget["MAX_QUERIES"])
+        problems = recorder.check(max_queries, budget["MAX_DUPLICATES"])
+        if settings.DEBUG:
+            response["X-Query-Count"] = recorder.count
+            response["X-Query-Time-Ms"] = f"{recorder.duration * 1000:.1f}"
+            response["X-Query-Duplicates"] = recorder.max_duplicates
+        if problems:
+            message = f"{request.method} {view_name}: " + "; ".join(problems)
+            if budget["RAISE"]:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with serializer_timer() as timer:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        route, method = get_route(request), get_method(request)
+        if route == METRICS_ROUTE:
+            return response
+        registry.observe("http_request_duration_seconds", route, method, duration)
+        registry.observe("http_request_serializer_seconds", route, method, timer[0])
+        recorder = getattr(request, "query_recorder", None)
+        if recorder is not None:
+            registry.observe("http_request_db_seconds", route, method, recorder.duration)
+        if not response.streaming:
+            registry.observe("http_response_size_bytes", route, method, len(response.content))
+        registry.increment("http_requests_total", route, method, response.status_code)
+        return response
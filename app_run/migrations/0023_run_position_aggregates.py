@@ -0,0 +1,70 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:01
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from geopy.distance import geodesic
+
+
+def backfill_run_aggregates(apps, schema_editor):
+    Run = apps.get_model("app_run", "Run")
+    Position = apps.get_model("app_run", "Position")
+    for run in Run.objects.exclude(status="init").iterator():
+        positions = Position.objects.filter(run_id=run.id)
+        totals = positions.aggregate(
+            count=Count("id"), first=Min("date_time"), last=Max("date_time"), speed_sum=Sum("speed")
+        )
+        if not totals["count"]:
+            continue
+        if run.status == "finished":
+            distance = run.distance
+        else:
+            coordinates = list(positions.order_by("id").values_list("latitude", "longitude"))
+            distance = sum(geodesic(a, b).km for a, b in zip(coordinates, coordinates[1:]))
+        run.positions_count = totals["count"]
+        run.positions_distance = distance
+        run.positions_speed_sum = totals["speed_sum"] or 0
+        run.first_position_at = totals["first"]
+        run.last_position_at = totals["last"]
+        run.save(update_fields=[
+            "positions_count",
+            "positions_distance",
+            "positions_speed_sum",
+            "first_position_at",
+            "last_position_at",
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0022_testmodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='first_position_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='время первой точки'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='last_position_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='время последней точки'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='positions_count',
+            field=models.IntegerField(default=0, verbose_name='количество точек'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='positions_distance',
+            field=models.FloatField(default=0, verbose_name='накопленная дистанция в км'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='positions_speed_sum',
+            field=models.FloatField(default=0, verbose_name='сумма скоростей точек'),
+        ),
+        migrations.RunPython(backfill_run_aggregates, migrations.RunPython.noop),
+    ]
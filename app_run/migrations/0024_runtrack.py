@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0023_run_position_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points_count', models.PositiveIntegerField(default=0, verbose_name='количество точек')),
+                ('data', models.BinaryField(verbose_name='упакованный трек')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата упаковки')),
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='track', to='app_run.run', verbose_name='забег')),
+            ],
+            options={
+                'verbose_name': 'упакованный трек',
+                'verbose_name_plural': 'упакованные треки',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0024_runtrack'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='run',
+            name='created_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='дата начала'),
+        ),
+        migrations.AddIndex(
+            model_name='position',
+            index=models.Index(fields=['run', 'id'], name='position_run_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:11
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def merge_duplicate_uids(apps, schema_editor):
+    UnitLocation = apps.get_model("app_run", "UnitLocation")
+    UnitAthleteRelation = apps.get_model("app_run", "UnitAthleteRelation")
+    duplicates = (
+        UnitLocation.objects.values("uid")
+        .annotate(count=Count("id"), last_id=Max("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        stale = UnitLocation.objects.filter(uid=duplicate["uid"]).exclude(pk=duplicate["last_id"])
+        UnitAthleteRelation.objects.filter(unit__in=stale).update(unit_id=duplicate["last_id"])
+        stale.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0025_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='unitlocation',
+            name='uid',
+            field=models.CharField(max_length=8, unique=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:13
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0026_unitlocation_uid_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('finished', 'finished'), ('failed', 'failed')], default='queued', max_length=20, verbose_name='статус')),
+                ('file_name', models.CharField(max_length=255, verbose_name='имя файла')),
+                ('file_data', models.BinaryField(verbose_name='содержимое файла')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='обработано строк')),
+                ('rows_rejected', models.PositiveIntegerField(default=0, verbose_name='отклонено строк')),
+                ('rejected_rows', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='отклонённые строки')),
+                ('error', models.TextField(blank=True, default='', verbose_name='ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='дата начала')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='дата окончания')),
+            ],
+            options={
+                'verbose_name': 'задача загрузки',
+                'verbose_name_plural': 'задачи загрузки',
+                'indexes': [models.Index(fields=['status', 'id'], name='uploadjob_status_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:13
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_challenges(apps, schema_editor):
+    Challenge = apps.get_model("app_run", "Challenge")
+    duplicates = (
+        Challenge.objects.values("athlete_id", "full_name")
+        .annotate(count=Count("id"), first_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        Challenge.objects.filter(
+            athlete_id=duplicate["athlete_id"], full_name=duplicate["full_name"]
+        ).exclude(pk=duplicate["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0027_uploadjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_challenges, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='challenge',
+            constraint=models.UniqueConstraint(fields=('athlete', 'full_name'), name='challenge_athlete_full_name_unique'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_athlete_stats(apps, schema_editor):
+    Run = apps.get_model("app_run", "Run")
+    AthleteStats = apps.get_model("app_run", "AthleteStats")
+    rows = (
+        Run.objects.filter(status="finished")
+        .values("athlete_id")
+        .annotate(
+            finished_runs=Count("id"),
+            total_distance=Coalesce(Sum("distance"), Value(0.0)),
+            total_time=Coalesce(Sum("run_time_seconds"), Value(0)),
+            best_speed=Coalesce(Max("speed"), Value(0.0)),
+            speed_sum=Coalesce(Sum("speed"), Value(0.0)),
+            longest_run=Coalesce(Max("distance"), Value(0.0)),
+            last_run_at=Max(Coalesce("last_position_at", "created_at")),
+        )
+        .order_by("athlete_id")
+    )
+    AthleteStats.objects.bulk_create((AthleteStats(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0028_challenge_unique_per_athlete'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AthleteStats',
+            fields=[
+                ('athlete', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='athlete_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='бегун')),
+                ('finished_runs', models.PositiveIntegerField(default=0, verbose_name='завершённых забегов')),
+                ('total_distance', models.FloatField(default=0, verbose_name='общая дистанция в км')),
+                ('total_time', models.PositiveIntegerField(default=0, verbose_name='общее время в секундах')),
+                ('best_speed', models.FloatField(default=0, verbose_name='лучшая средняя скорость в м/с')),
+                ('speed_sum', models.FloatField(default=0, verbose_name='сумма средних скоростей')),
+                ('longest_run', models.FloatField(default=0, verbose_name='самый длинный забег в км')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='дата последнего забега')),
+            ],
+            options={
+                'verbose_name': 'статистика бегуна',
+                'verbose_name_plural': 'статистика бегунов',
+            },
+        ),
+        migrations.RunPython(fill_athlete_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0029_athletestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['athlete', 'status', 'created_at'], name='run_athlete_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:22
+
+import datetime
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_leaderboards(apps, schema_editor):
+    Run = apps.get_model("app_run", "Run")
+    LeaderboardEntry = apps.get_model("app_run", "LeaderboardEntry")
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    runs = Run.objects.filter(status="finished").values_list(
+        "athlete_id", "distance", "speed", "last_position_at", "created_at"
+    )
+    for athlete_id, distance, speed, last_position_at, created_at in runs.iterator():
+        date = timezone.localdate(last_position_at or created_at)
+        for period, period_start in (
+            ("week", date - datetime.timedelta(days=date.weekday())),
+            ("month", date.replace(day=1)),
+            ("all", datetime.date(1970, 1, 1)),
+        ):
+            total = totals[(period, period_start, athlete_id)]
+            total[0] += 1
+            total[1] += distance
+            total[2] += speed
+    LeaderboardEntry.objects.bulk_create(
+        (
+            LeaderboardEntry(
+                period=period,
+                period_start=period_start,
+                athlete_id=athlete_id,
+                runs=count,
+                distance=distance,
+                speed_sum=speed_sum,
+                speed=speed_sum / count,
+            )
+            for (period, period_start, athlete_id), (count, distance, speed_sum) in totals.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0030_run_athlete_status_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Неделя'), ('month', 'Месяц'), ('all', 'За всё время')], max_length=10, verbose_name='период')),
+                ('period_start', models.DateField(verbose_name='начало периода')),
+                ('runs', models.PositiveIntegerField(default=0, verbose_name='забегов за период')),
+                ('distance', models.FloatField(default=0, verbose_name='дистанция за период в км')),
+                ('speed_sum', models.FloatField(default=0, verbose_name='сумма средних скоростей')),
+                ('speed', models.FloatField(default=0, verbose_name='средняя скорость за период в м/с')),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL, verbose_name='бегун')),
+            ],
+            options={
+                'verbose_name': 'позиция в рейтинге',
+                'verbose_name_plural': 'рейтинги',
+                'indexes': [models.Index(fields=['period', 'period_start', '-distance'], name='leaderboard_distance_idx'), models.Index(fields=['period', 'period_start', '-speed'], name='leaderboard_speed_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'athlete'), name='leaderboard_period_athlete_unique'),
+        ),
+        migrations.RunPython(fill_leaderboards, migrations.RunPython.noop),
+    ]
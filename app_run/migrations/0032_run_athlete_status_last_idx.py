@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_run', '0031_leaderboardentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='run',
+            name='run_athlete_status_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['athlete', 'status', 'last_position_at'], name='run_athlete_status_last_idx'),
+        ),
+    ]
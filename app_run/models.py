@@ -1,4 +1,5 @@
 from django.contrib.auth.models import User, AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 
@@ -27,10 +28,15 @@ class Run(models.Model):
     )
     comment = models.CharField(max_length=255, verbose_name="комментарий")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="init", verbose_name="статус забега")
-    created_at = models.DateTimeField(auto_now=True, verbose_name="дата начала")
+    created_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="дата начала")
     distance = models.FloatField(default=0, verbose_name="пройденная дистанция в км")
     run_time_seconds = models.IntegerField(default=0, verbose_name="время забега в секундах")
     speed = models.FloatField(default=0, verbose_name="средняя скорость в м/с")
+    positions_count = models.IntegerField(default=0, verbose_name="количество точек")
+    positions_distance = models.FloatField(default=0, verbose_name="накопленная дистанция в км")
+    positions_speed_sum = models.FloatField(default=0, verbose_name="сумма скоростей точек")
+    first_position_at = models.DateTimeField(null=True, blank=True, verbose_name="время первой точки")
+    last_position_at = models.DateTimeField(null=True, blank=True, verbose_name="время последней точки")
 
     def __str__(self):
         return f"{self.id} {self.athlete.username}, {self.get_status_display()}"
@@ -38,6 +44,9 @@ class Run(models.Model):
     class Meta:
         verbose_name = "забег"
         verbose_name_plural = "забеги"
+        indexes = [
+            models.Index(fields=["athlete", "status", "last_position_at"], name="run_athlete_status_last_idx"),
+        ]
 
 
 class Position(models.Model):
@@ -60,6 +69,23 @@ class Position(models.Model):
     class Meta:
         verbose_name = "координаты забега"
         verbose_name_plural = "координаты забегов"
+        indexes = [
+            models.Index(fields=["run", "id"], name="position_run_id_idx"),
+        ]
+
+
+class RunTrack(models.Model):
+    run = models.OneToOneField(to=Run, on_delete=models.CASCADE, verbose_name="забег", related_name="track")
+    points_count = models.PositiveIntegerField(default=0, verbose_name="количество точек")
+    data = models.BinaryField(verbose_name="упакованный трек")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="дата упаковки")
+
+    def __str__(self):
+        return f"{self.run_id}: {self.points_count} points"
+
+    class Meta:
+        verbose_name = "упакованный трек"
+        verbose_name_plural = "упакованные треки"
 
 
 class Subscribe(models.Model):
@@ -90,11 +116,14 @@ class Challenge(models.Model):
     class Meta:
         verbose_name = "челлендж"
         verbose_name_plural = "челленджи"
+        constraints = [
+            models.UniqueConstraint(fields=["athlete", "full_name"], name="challenge_athlete_full_name_unique"),
+        ]
 
 
 class UnitLocation(models.Model):
     name = models.CharField(max_length=50)
-    uid = models.CharField(max_length=8)
+    uid = models.CharField(max_length=8, unique=True)
     latitude = models.FloatField(
         validators=[MinValueValidator(-90.0), MaxValueValidator(90.0)],
         verbose_name="широта"
@@ -164,6 +193,97 @@ class CoachRate(models.Model):
         return f"{self.coach}, {self.athlete} - rate: {self.rating}"
 
 
+class UploadJob(models.Model):
+    STATUS_CHOICES = (
+        ("queued", "queued"),
+        ("running", "running"),
+        ("finished", "finished"),
+        ("failed", "failed"),
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued", verbose_name="статус")
+    file_name = models.CharField(max_length=255, verbose_name="имя файла")
+    file_data = models.BinaryField(verbose_name="содержимое файла")
+    rows_processed = models.PositiveIntegerField(default=0, verbose_name="обработано строк")
+    rows_rejected = models.PositiveIntegerField(default=0, verbose_name="отклонено строк")
+    rejected_rows = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name="отклонённые строки")
+    error = models.TextField(blank=True, default="", verbose_name="ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="дата создания")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="дата начала")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="дата окончания")
+
+    def __str__(self):
+        return f"{self.id} {self.file_name}, {self.status}"
+
+    class Meta:
+        verbose_name = "задача загрузки"
+        verbose_name_plural = "задачи загрузки"
+        indexes = [
+            models.Index(fields=["status", "id"], name="uploadjob_status_id_idx"),
+        ]
+
+
+class AthleteStats(models.Model):
+    athlete = models.OneToOneField(
+        to=User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="бегун",
+        related_name="athlete_stats"
+    )
+    finished_runs = models.PositiveIntegerField(default=0, verbose_name="завершённых забегов")
+    total_distance = models.FloatField(default=0, verbose_name="общая дистанция в км")
+    total_time = models.PositiveIntegerField(default=0, verbose_name="общее время в секундах")
+    best_speed = models.FloatField(default=0, verbose_name="лучшая средняя скорость в м/с")
+    speed_sum = models.FloatField(default=0, verbose_name="сумма средних скоростей")
+    longest_run = models.FloatField(default=0, verbose_name="самый длинный забег в км")
+    last_run_at = models.DateTimeField(null=True, blank=True, verbose_name="дата последнего забега")
+
+    def __str__(self):
+        return f"{self.athlete_id}: {self.finished_runs} runs, {self.total_distance} km"
+
+    class Meta:
+        verbose_name = "статистика бегуна"
+        verbose_name_plural = "статистика бегунов"
+
+
+class LeaderboardEntry(models.Model):
+    PERIOD_CHOICES = (
+        ("week", "Неделя"),
+        ("month", "Месяц"),
+        ("all", "За всё время"),
+    )
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, verbose_name="период")
+    period_start = models.DateField(verbose_name="начало периода")
+    athlete = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        verbose_name="бегун",
+        related_name="leaderboard_entries"
+    )
+    runs = models.PositiveIntegerField(default=0, verbose_name="забегов за период")
+    distance = models.FloatField(default=0, verbose_name="дистанция за период в км")
+    speed_sum = models.FloatField(default=0, verbose_name="сумма средних скоростей")
+    speed = models.FloatField(default=0, verbose_name="средняя скорость за период в м/с")
+
+    def __str__(self):
+        return f"{self.period} {self.period_start}: {self.athlete_id}"
+
+    class Meta:
+        verbose_name = "позиция в рейтинге"
+        verbose_name_plural = "рейтинги"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "period_start", "athlete"],
+                name="leaderboard_period_athlete_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["period", "period_start", "-distance"], name="leaderboard_distance_idx"),
+            models.Index(fields=["period", "period_start", "-speed"], name="leaderboard_speed_idx"),
+        ]
+
+
 class TestModel(models.Model):
     name = models.CharField(max_length=255)
     age = models.IntegerField()
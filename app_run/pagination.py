@@ -0,0 +1,111 @@
+from bisect import bisect_left, bisect_right
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+def estimate_count(queryset) -> int | None:
+    if not isinstance(queryset, QuerySet) or queryset.query.where or queryset.query.is_sliced:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if not row or row[0] < 0:
+        return None
+    return row[0]
+
+
+class IdOrderedList:
+    """Objects sorted by id with the part of the QuerySet API the paginators use, for rows decoded in memory."""
+
+    def __init__(self, items: list, descending: bool = False):
+        self.items = items
+        self.ids = [item.id for item in items]
+        self.descending = descending
+
+    def order_by(self, *ordering):
+        if ordering not in (("id",), ("-id",)):
+            raise ValueError(f"Only ordering by id is supported, got {ordering}")
+        return IdOrderedList(self.items, ordering[0] == "-id")
+
+    def filter(self, id__gt=None, id__lt=None):
+        start = 0 if id__gt is None else bisect_right(self.ids, int(id__gt))
+        end = len(self.ids) if id__lt is None else bisect_left(self.ids, int(id__lt))
+        return IdOrderedList(self.items[start:end], self.descending)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return (self.items[::-1] if self.descending else self.items)[index]
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        return estimate if estimate is not None else super().count
+
+
+class CustomPagination(PageNumberPagination):
+    page_size_query_param = 'size'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(CursorPagination):
+    ordering = "-id"
+    page_size_query_param = 'size'
+
+
+class PositionKeysetPagination(KeysetPagination):
+    ordering = "id"
+
+
+class HybridPagination(BasePagination):
+    keyset_class = KeysetPagination
+    page_number_class = CustomPagination
+
+    def __init__(self):
+        self.paginator = None
+
+    def get_paginator(self, request):
+        if self.page_number_class.page_query_param in request.query_params:
+            return self.page_number_class()
+        return self.keyset_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.keyset_class().get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *self.keyset_class().get_schema_operation_parameters(view),
+            *self.page_number_class().get_schema_operation_parameters(view),
+        ]
+
+
+class PositionHybridPagination(HybridPagination):
+    keyset_class = PositionKeysetPagination
@@ -0,0 +1,80 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_QUERY_BUDGET = {
+    "MAX_QUERIES": 50,
+    "MAX_DUPLICATES": 5,
+    "RAISE": False,
+    # url name -> max queries, e.g. {"users-list": 3}
+    "VIEWS": {},
+}
+PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+VALUES_ROWS = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_query_budget() -> dict:
+    return {**DEFAULT_QUERY_BUDGET, **getattr(settings, "QUERY_BUDGET", {})}
+
+
+def query_shape(sql: str) -> str:
+    # IN lists and multi-row VALUES differ only by the number of placeholders.
+    return VALUES_ROWS.sub(r"\1", PLACEHOLDER_LIST.sub("(...)", sql))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    @property
+    def max_duplicates(self) -> int:
+        return max(self.shapes.values(), default=0)
+
+    def duplicates(self, threshold: int = 2) -> list[tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def check(self, max_queries: int | None = None, max_duplicates: int | None = None) -> list[str]:
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f"{self.count} queries, budget is {max_queries}")
+        if max_duplicates is not None and self.max_duplicates > max_duplicates:
+            for shape, count in self.duplicates(max_duplicates + 1):
+                problems.append(f"repeated {count} times: {shape}")
+        return problems
+
+
+@contextmanager
+def query_budget(max_queries: int | None = None, max_duplicates: int | None = None):
+    """Fails with AssertionError when the block runs more queries or repeats one shape more than allowed."""
+    recorder = QueryRecorder()
+    with recorder.record():
+        yield recorder
+    problems = recorder.check(max_queries, max_duplicates)
+    if problems:
+        raise AssertionError("Query budget exceeded:\n" + "\n".join(problems))
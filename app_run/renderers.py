@@ -0,0 +1,20 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+        return "".join(
+            json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for item in data
+        ).encode("utf-8")
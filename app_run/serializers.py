@@ -12,6 +12,7 @@ from app_run.models import (
     UnitAthleteRelation,
     AthleteInfo,
     CoachRate,
+    UploadJob,
 )
 from rest_framework.serializers import (
     ModelSerializer,
@@ -24,8 +25,22 @@ from rest_framework.serializers import (
     PrimaryKeyRelatedField,
     Serializer,
     FileField,
+    ListField,
+    ChoiceField,
+    DateField,
 )
-from .services import get_distance_speed_from_last_position, check_unit_locations
+from .services import (
+    get_distance_speed_from_last_position,
+    check_unit_locations,
+    update_run_aggregates,
+    create_positions_batch,
+    cache_last_position,
+)
+
+from .importers import IMPORT_FORMATS, detect_format
+from .leaderboards import LEADERBOARD_PERIODS, LEADERBOARD_METRICS
+
+POSITIONS_BATCH_MAX_SIZE = 5000
 
 
 class UserDataSerializer(ModelSerializer):
@@ -61,7 +76,34 @@ class RunSerializer(ModelSerializer):
         ]
 
 
-class UserSerializer(ModelSerializer):
+class UserRunSerializer(ModelSerializer):
+    class Meta:
+        model = Run
+        fields = [
+            "id",
+            "status",
+            "created_at",
+            "distance",
+            "run_time_seconds",
+            "speed",
+        ]
+
+
+class SparseFieldsMixin:
+    # context["fields"] limits the output to the given names, context["expand"] adds Meta.expandable_fields.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        for name in self.context.get("expand", ()):
+            if name in expandable:
+                self.fields[name] = expandable[name]()
+        fields = self.context.get("fields")
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - set(self.context.get("expand", ())):
+                self.fields.pop(name)
+
+
+class UserSerializer(SparseFieldsMixin, ModelSerializer):
     type = SerializerMethodField()
     runs_finished = IntegerField(read_only=True)
     items = SerializerMethodField()
@@ -81,6 +123,9 @@ class UserSerializer(ModelSerializer):
             "rating",
             "date_joined",
         ]
+        expandable_fields = {
+            "runs": lambda: UserRunSerializer(source="user_run", many=True, read_only=True),
+        }
 
     def get_type(self, instance) -> str:
         match instance.is_staff:
@@ -109,8 +154,7 @@ class CoachSerializer(UserSerializer):
         ]
 
     def get_athletes(self, obj) -> list[int]:
-        athletes = obj.coach_subscribe.all().values_list("athlete_id", flat=True)
-        return athletes
+        return [subscribe.athlete_id for subscribe in obj.coach_subscribe.all()]
 
 
 class AthleteSerializer(UserSerializer):
@@ -152,9 +196,12 @@ class PositionSerializer(ModelSerializer):
         if not date_time:
             validated_data["date_time"] = datetime.datetime.now(datetime.timezone.utc)
         prev_position = self.context.get("prev_position")
+        segment_distance = 0.0
         if prev_position:
-            validated_data = get_distance_speed_from_last_position(prev_position, validated_data)
+            segment_distance = get_distance_speed_from_last_position(prev_position, validated_data)
         new_position = super().create(validated_data)
+        update_run_aggregates(new_position, segment_distance)
+        cache_last_position(new_position, validated_data["run"].positions_count + 1)
         units_for_create = check_unit_locations(new_position)
         if units_for_create:
             athlete_id = validated_data["run"].athlete_id
@@ -163,6 +210,29 @@ class PositionSerializer(ModelSerializer):
         return new_position
 
 
+class PositionPointSerializer(Serializer):
+    latitude = FloatField(min_value=-90.0, max_value=90.0)
+    longitude = FloatField(min_value=-180.0, max_value=180.0)
+    date_time = DateTimeField(required=False)
+
+
+class PositionBatchSerializer(Serializer):
+    run = PrimaryKeyRelatedField(queryset=Run.objects.all())
+    positions = ListField(child=PositionPointSerializer(), allow_empty=False, max_length=POSITIONS_BATCH_MAX_SIZE)
+
+    def validate_run(self, run):
+        if run.status != "in_progress":
+            raise ValidationError("Run must have status 'in_progress'")
+        return run
+
+    def create(self, validated_data):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        points = validated_data["positions"]
+        for point in points:
+            point.setdefault("date_time", now)
+        return create_positions_batch(validated_data["run"], points, self.context.get("prev_position"))
+
+
 class SubscribeSerializer(ModelSerializer):
     coach = PrimaryKeyRelatedField(
         queryset=User.objects.filter(is_staff=True)
@@ -195,26 +265,6 @@ class ChallengeSerializer(ModelSerializer):
         ]
 
 
-class ChallengeAthleteSerializer(ModelSerializer):
-    full_name = SerializerMethodField()
-
-    class Meta:
-        model = User
-        fields = [
-            "id",
-            "full_name",
-            "username",
-        ]
-
-    def get_full_name(self, obj):
-        return f"{obj.first_name} {obj.last_name}"
-
-
-class ChallengesSummaryListSerializer(Serializer):
-    name_to_display = CharField(source="full_name")
-    athletes = ChallengeAthleteSerializer(many=True)
-
-
 CITIES = [
     "New York",
     "Paris",
@@ -232,6 +282,38 @@ class UploadFileSerializer(Serializer):
     file = FileField()
 
 
+class RunImportSerializer(Serializer):
+    file = FileField()
+    athlete = PrimaryKeyRelatedField(queryset=User.objects.all())
+    format = ChoiceField(choices=IMPORT_FORMATS, required=False)
+    comment = CharField(max_length=255, required=False, default="")
+
+    def validate(self, attrs):
+        attrs.setdefault("format", detect_format(attrs["file"].name))
+        if not attrs["format"]:
+            raise ValidationError({"format": f"Can't detect file format, expected one of {', '.join(IMPORT_FORMATS)}"})
+        return attrs
+
+
+class CoachAnalyticsParamsSerializer(Serializer):
+    date_from = DateField(required=False)
+    date_to = DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("date_from") and attrs.get("date_to") and attrs["date_from"] > attrs["date_to"]:
+            raise ValidationError({"date_to": "date_to must not be earlier than date_from"})
+        return attrs
+
+
+class LeaderboardParamsSerializer(Serializer):
+    period = ChoiceField(choices=LEADERBOARD_PERIODS, default="week")
+    metric = ChoiceField(choices=LEADERBOARD_METRICS, default="distance")
+    date = DateField(required=False)
+    coach = IntegerField(required=False, source="coach_id")
+    athlete = IntegerField(required=False, source="athlete_id")
+    limit = IntegerField(default=10, validators=[MinValueValidator(1), MaxValueValidator(100)])
+
+
 class UnitLocationSerializer(ModelSerializer):
     class Meta:
         model = UnitLocation
@@ -264,3 +346,36 @@ class CoachRateSerializer(ModelSerializer):
     class Meta:
         model = CoachRate
         fields = ["id", "rating"]
+
+
+class UploadJobSerializer(ModelSerializer):
+    throughput = SerializerMethodField()
+    rejected_rows = SerializerMethodField()
+
+    class Meta:
+        model = UploadJob
+        fields = [
+            "id",
+            "status",
+            "file_name",
+            "rows_processed",
+            "rows_rejected",
+            "throughput",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "rejected_rows",
+        ]
+
+    def get_throughput(self, obj) -> float | None:
+        if not obj.started_at:
+            return None
+        end = obj.finished_at or datetime.datetime.now(datetime.timezone.utc)
+        seconds = (end - obj.started_at).total_seconds()
+        return round(obj.rows_processed / seconds, 2) if seconds > 0 else None
+
+    def get_rejected_rows(self, obj) -> list | None:
+        if obj.status != "finished":
+            return None
+        return obj.rejected_rows
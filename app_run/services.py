@@ -1,35 +1,30 @@
-from geopy.distance import geodesic
+from itertools import accumulate
 
-from .models import Position, UnitLocation
-from django.db.models import Min, Max, QuerySet, Avg
+import numpy as np
 
+from .distance import distances, segment_distances
+from .analytics import invalidate_coach_analytics
+from .challenges import evaluate_challenges
+from .leaderboards import record_leaderboard_run
+from .models import Position, UnitLocation, Run, UnitAthleteRelation, Subscribe
+from .spatial import unit_location_index
+from .stats import record_finished_run
+from .versions import bump_version
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
 
-def get_distance(positions: list[Position]) -> float:
-    distance_total = 0
-    if len(positions) >= 2:
-        for i in range(len(positions) - 1):
-            distance_total += geodesic(
-                (positions[i].latitude, positions[i].longitude),
-                (positions[i+1].latitude, positions[i+1].longitude)
-            ).km
-    return round(distance_total, 2)
+UNIT_COLLECT_RADIUS_M = 100
 
-
-def get_run_time_seconds(positions: QuerySet["Position"]) -> int:
-    border_positions_time = positions.aggregate(
-        first_time=Min("date_time"),
-        last_time=Max("date_time")
-    )
-    first_time = border_positions_time.get("first_time")
-    last_time = border_positions_time.get("last_time")
-    if first_time and last_time:
-        return (last_time - first_time).seconds
-    return 0
+LAST_POSITION_CACHE_KEY = "app_run:run:{run_id}:last_position"
+LAST_POSITION_CACHE_TIMEOUT = 60 * 60
+LAST_POSITION_FIELDS = ("id", "run_id", "latitude", "longitude", "date_time", "speed", "distance")
+RUN_VERSION = "run:{run_id}"
 
 
-def _get_current_distance(prev_latitude, prev_longitude, cur_latitude, cur_longitude) -> float:
-    distance = geodesic((prev_latitude, prev_longitude), (cur_latitude, cur_longitude)).km
-    return round(distance, 2)
+def get_segment_distance(prev_latitude, prev_longitude, cur_latitude, cur_longitude) -> float:
+    return float(distances(prev_latitude, prev_longitude, cur_latitude, cur_longitude))
 
 
 def _get_current_speed(prev_time, cur_time, distance) -> float:
@@ -40,34 +35,179 @@ def _get_current_speed(prev_time, cur_time, distance) -> float:
         return 0
 
 
-def get_distance_speed_from_last_position(prev_position, validated_data) -> dict[str, [str | int | float]]:
-    cur_latitude = validated_data.get("latitude")
-    cur_longitude = validated_data.get("longitude")
-    cur_time = validated_data.get("date_time")
-    distance = _get_current_distance(
+def get_distance_speed_from_last_position(prev_position, validated_data) -> float:
+    # Fills distance and speed in validated_data, returns the unrounded segment for the run aggregates.
+    segment_distance = get_segment_distance(
         prev_position.latitude,
         prev_position.longitude,
-        cur_latitude,
-        cur_longitude
+        validated_data.get("latitude"),
+        validated_data.get("longitude"),
     )
-    speed = _get_current_speed(prev_position.date_time, cur_time, distance)
+    distance = round(segment_distance, 2)
     validated_data["distance"] = prev_position.distance + distance
-    validated_data["speed"] = speed
-    return validated_data
+    validated_data["speed"] = _get_current_speed(prev_position.date_time, validated_data.get("date_time"), distance)
+    return segment_distance
 
 
-def get_average_speed(positions: QuerySet["Position"]) -> float:
-    if not positions:
-        return 0
-    avg_speed = positions.aggregate(avg_speed=Avg("speed")).get("avg_speed")
-    return round(avg_speed, 2)
+def get_last_position(run: Run) -> Position | None:
+    # Caches may be per process, an entry is trusted only if it was written at the run's current point count.
+    data = cache.get(LAST_POSITION_CACHE_KEY.format(run_id=run.id))
+    if data is not None and data.pop("positions_count", None) == run.positions_count:
+        return Position(**data)
+    position = Position.objects.filter(run_id=run.id).order_by("-id").first()
+    if position:
+        cache_last_position(position, run.positions_count)
+    return position
+
+
+def cache_last_position(position: Position, positions_count: int) -> None:
+    data = {field: getattr(position, field) for field in LAST_POSITION_FIELDS}
+    data["positions_count"] = positions_count
+    cache.set(LAST_POSITION_CACHE_KEY.format(run_id=position.run_id), data, LAST_POSITION_CACHE_TIMEOUT)
+
+
+def clear_last_position(run_id: int) -> None:
+    cache.delete(LAST_POSITION_CACHE_KEY.format(run_id=run_id))
+
+
+def update_run_aggregates(position: Position, segment_distance: float = 0.0) -> None:
+    date_time = Value(position.date_time)
+    Run.objects.filter(pk=position.run_id).update(
+        positions_count=F("positions_count") + 1,
+        positions_distance=F("positions_distance") + segment_distance,
+        positions_speed_sum=F("positions_speed_sum") + position.speed,
+        first_position_at=Coalesce(Least("first_position_at", date_time), date_time),
+        last_position_at=Coalesce(Greatest("last_position_at", date_time), date_time),
+    )
+
+
+def recompute_run_aggregates(run_id: int) -> None:
+    # Edited or deleted points can't be taken back incrementally, the totals are rebuilt from the remaining rows.
+    rows = list(
+        Position.objects.filter(run_id=run_id).order_by("id").values_list("latitude", "longitude", "speed", "date_time")
+    )
+    latitudes, longitudes, speeds, times = zip(*rows) if rows else ((), (), (), ())
+    Run.objects.filter(pk=run_id).update(
+        positions_count=len(rows),
+        positions_distance=float(segment_distances(latitudes, longitudes).sum()),
+        positions_speed_sum=sum(speeds),
+        first_position_at=min(times, default=None),
+        last_position_at=max(times, default=None),
+    )
+
+
+def get_run_totals(run: Run) -> dict[str, int | float]:
+    run_time_seconds = 0
+    if run.first_position_at and run.last_position_at:
+        run_time_seconds = int((run.last_position_at - run.first_position_at).total_seconds())
+    avg_speed = 0
+    if run.positions_count:
+        avg_speed = round(run.positions_speed_sum / run.positions_count, 2)
+    return {
+        "positions_count": run.positions_count,
+        "distance": round(run.positions_distance, 2),
+        "run_time_seconds": run_time_seconds,
+        "speed": avg_speed,
+    }
+
+
+def invalidate_run(run_id: int) -> int:
+    return bump_version(RUN_VERSION.format(run_id=run_id))
+
+
+def finish_run(run: Run) -> bool:
+    totals = get_run_totals(run)
+    with transaction.atomic():
+        # Conditional update: of two concurrent stops only one finishes the run and counts it in the stats.
+        finished = Run.objects.filter(pk=run.pk, status="in_progress").update(
+            status="finished",
+            distance=totals["distance"],
+            run_time_seconds=totals["run_time_seconds"],
+            speed=totals["speed"],
+        )
+        if not finished:
+            return False
+        run.status = "finished"
+        run.distance = totals["distance"]
+        run.run_time_seconds = totals["run_time_seconds"]
+        run.speed = totals["speed"]
+        record_finished_run(run)
+        record_leaderboard_run(run)
+        transaction.on_commit(lambda: invalidate_run(run.id))
+        # Every way a run finishes (stop, import) can earn challenges.
+        transaction.on_commit(lambda: evaluate_challenges([run.athlete_id]))
+        coach_id = Subscribe.objects.filter(athlete_id=run.athlete_id).values_list("coach_id", flat=True).first()
+        if coach_id:
+            transaction.on_commit(lambda: invalidate_coach_analytics(coach_id))
+    clear_last_position(run.id)
+    return True
 
 
 def check_unit_locations(position):
-    units_for_create = []
-    units = list(UnitLocation.objects.all())
-    for unit in units:
-        dist = geodesic((position.latitude, position.longitude), (unit.latitude, unit.longitude)).meters
-        if dist <= 100:
-            units_for_create.append(unit)
-    return units_for_create
+    unit_ids = unit_location_index.nearby(position.latitude, position.longitude, UNIT_COLLECT_RADIUS_M)
+    if not unit_ids:
+        return []
+    return list(UnitLocation.objects.filter(pk__in=unit_ids))
+
+
+def create_positions_batch(
+    run: Run,
+    points: list[dict],
+    prev_position: Position | None = None,
+    award_units: bool = True,
+) -> list[Position]:
+    if not points:
+        return []
+    latitudes = np.array([point["latitude"] for point in points], dtype=np.float64)
+    longitudes = np.array([point["longitude"] for point in points], dtype=np.float64)
+    times = [point["date_time"] for point in points]
+    if prev_position:
+        latitudes = np.insert(latitudes, 0, prev_position.latitude)
+        longitudes = np.insert(longitudes, 0, prev_position.longitude)
+        times.insert(0, prev_position.date_time)
+        segments = segment_distances(latitudes, longitudes)
+        distance_before = prev_position.distance
+    else:
+        segments = np.concatenate(([0.0], segment_distances(latitudes, longitudes)))
+        times.insert(0, times[0])
+        distance_before = 0
+
+    rounded = np.round(segments, 2).tolist()
+    # Accumulate left to right like the single-point path does, so both give identical floats.
+    cumulative = list(accumulate(rounded, initial=distance_before))[1:]
+    positions = []
+    for i, point in enumerate(points):
+        speed = 0
+        if i or prev_position:
+            speed = _get_current_speed(times[i], times[i + 1], rounded[i])
+        positions.append(Position(
+            run=run,
+            latitude=point["latitude"],
+            longitude=point["longitude"],
+            date_time=point["date_time"],
+            distance=cumulative[i],
+            speed=speed,
+        ))
+
+    unit_ids = set()
+    for point in points if award_units else []:
+        unit_ids.update(
+            unit_location_index.nearby(point["latitude"], point["longitude"], UNIT_COLLECT_RADIUS_M)
+        )
+
+    first_time, last_time = Value(min(times[1:])), Value(max(times[1:]))
+    with transaction.atomic():
+        Position.objects.bulk_create(positions)
+        Run.objects.filter(pk=run.pk).update(
+            positions_count=F("positions_count") + len(positions),
+            positions_distance=F("positions_distance") + float(segments.sum()),
+            positions_speed_sum=F("positions_speed_sum") + sum(position.speed for position in positions),
+            first_position_at=Coalesce(Least("first_position_at", first_time), first_time),
+            last_position_at=Coalesce(Greatest("last_position_at", last_time), last_time),
+        )
+        UnitAthleteRelation.objects.bulk_create(
+            [UnitAthleteRelation(athlete_id=run.athlete_id, unit_id=unit_id) for unit_id in sorted(unit_ids)]
+        )
+    last_position, positions_count = positions[-1], run.positions_count + len(positions)
+    transaction.on_commit(lambda: cache_last_position(last_position, positions_count))
+    return positions
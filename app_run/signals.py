@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .analytics import invalidate_coach_analytics
+from .challenges import CHALLENGES_VERSION
+from .leaderboards import record_leaderboard_run, remove_leaderboard_run
+from .models import UnitLocation, Challenge, Subscribe, Run
+from .services import invalidate_run
+from .spatial import invalidate_unit_locations
+from .stats import refresh_athlete_stats
+from .versions import bump_version, USERS_VERSION
+
+
+@receiver([post_save, post_delete], sender=UnitLocation)
+def unit_location_changed(sender, **kwargs):
+    invalidate_unit_locations()
+
+
+@receiver(post_save, sender=Challenge)
+def challenge_saved(sender, created, **kwargs):
+    if created:
+        bump_version(CHALLENGES_VERSION)
+
+
+@receiver(post_delete, sender=Challenge)
+def challenge_deleted(sender, **kwargs):
+    bump_version(CHALLENGES_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Subscribe)
+def subscribe_changed(sender, instance, **kwargs):
+    invalidate_coach_analytics(instance.coach_id)
+
+
+@receiver([post_save, post_delete], sender=Run)
+def run_changed(sender, instance, **kwargs):
+    invalidate_run(instance.pk)
+
+
+@receiver(pre_save, sender=Run)
+def run_saving(sender, instance, update_fields=None, **kwargs):
+    # Saves that don't write the athlete (e.g. a start) skip the extra query.
+    if instance.pk and (update_fields is None or "athlete" in update_fields):
+        instance._counted_as = Run.objects.filter(pk=instance.pk).values_list("athlete_id", "status").first()
+
+
+@receiver(post_save, sender=Run)
+def run_saved(sender, instance, **kwargs):
+    # Finished runs are counted in the athlete stats and leaderboards by finish_run, a re-assigned run moves.
+    previous = vars(instance).pop("_counted_as", None)
+    if previous is None or previous == (instance.athlete_id, instance.status):
+        return
+    athlete_id, status = previous
+    if status == "finished":
+        remove_leaderboard_run(instance, athlete_id)
+        refresh_athlete_stats(athlete_id)
+    if instance.status == "finished":
+        record_leaderboard_run(instance)
+        refresh_athlete_stats(instance.athlete_id)
+
+
+@receiver(post_delete, sender=Run)
+def run_deleted(sender, instance, **kwargs):
+    if instance.status == "finished":
+        remove_leaderboard_run(instance, instance.athlete_id)
+        refresh_athlete_stats(instance.athlete_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached response shows.
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    bump_version(USERS_VERSION)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    bump_version(USERS_VERSION)
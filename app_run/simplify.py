@@ -0,0 +1,56 @@
+import heapq
+
+import numpy as np
+
+from .distance import EARTH_RADIUS_KM
+
+
+def _project(latitudes: np.ndarray, longitudes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Local equirectangular projection in meters, good enough at track scale.
+    lat = np.radians(latitudes)
+    lon = np.unwrap(np.radians(longitudes))
+    radius = EARTH_RADIUS_KM * 1000
+    return lon * np.cos(lat.mean()) * radius, lat * radius
+
+
+def _farthest(x: np.ndarray, y: np.ndarray, first: int, last: int) -> tuple[float, int]:
+    px, py = x[first + 1:last], y[first + 1:last]
+    dx, dy = x[last] - x[first], y[last] - y[first]
+    length_sq = dx * dx + dy * dy
+    if length_sq:
+        t = np.clip(((px - x[first]) * dx + (py - y[first]) * dy) / length_sq, 0.0, 1.0)
+    else:
+        t = 0.0
+    dist = np.hypot(px - (x[first] + t * dx), py - (y[first] + t * dy))
+    k = int(dist.argmax())
+    return float(dist[k]), first + 1 + k
+
+
+def simplify_track(latitudes, longitudes, tolerance: float | None = None, max_points: int | None = None) -> list[int]:
+    """Douglas-Peucker: indices of the points to keep, tolerance in meters."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    n = latitudes.size
+    if n <= 2 or (not tolerance and (max_points is None or max_points >= n)):
+        return list(range(n))
+    x, y = _project(latitudes, longitudes)
+    tolerance = tolerance or 0.0
+    max_points = max(max_points or n, 2)
+
+    # Splitting the farthest point first makes the result for max_points the most significant points.
+    keep = [0, n - 1]
+    queue = []
+
+    def push(first, last):
+        if last - first > 1:
+            dist, k = _farthest(x, y, first, last)
+            if dist > tolerance:
+                heapq.heappush(queue, (-dist, first, last, k))
+
+    push(0, n - 1)
+    while queue and len(keep) < max_points:
+        _, first, last, k = heapq.heappop(queue)
+        keep.append(k)
+        push(first, k)
+        push(k, last)
+    return sorted(keep)
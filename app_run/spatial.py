@@ -0,0 +1,98 @@
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .distance import distances
+from .versions import get_version, bump_version
+
+UNIT_LOCATIONS_VERSION = "unit_locations"
+CELL_SIZE_DEG = 0.01
+METERS_PER_DEGREE = 111_320.0
+
+
+def get_unit_locations_version() -> int:
+    return get_version(UNIT_LOCATIONS_VERSION)
+
+
+def invalidate_unit_locations() -> int:
+    return bump_version(UNIT_LOCATIONS_VERSION)
+
+
+class UnitLocationIndex:
+    def __init__(self, cell_size: float = CELL_SIZE_DEG):
+        self.cell_size = cell_size
+        self.lon_cells = round(360 / cell_size)
+        self._lock = threading.Lock()
+        # (cells, ids, latitudes, longitudes), swapped as a whole so readers never see a half-built index
+        self._data = ({}, np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        self._version = None
+        self._built_at = 0.0
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor((longitude + 180) / self.cell_size) % self.lon_cells,
+        )
+
+    def build(self, rows) -> None:
+        rows = list(rows)
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        latitudes = np.array([row[1] for row in rows], dtype=np.float64)
+        longitudes = np.array([row[2] for row in rows], dtype=np.float64)
+        buckets: dict[tuple[int, int], list[int]] = {}
+        for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+            buckets.setdefault(self._cell(latitude, longitude), []).append(i)
+        cells = {key: np.array(value, dtype=np.int64) for key, value in buckets.items()}
+        self._data = (cells, ids, latitudes, longitudes)
+
+    def refresh(self) -> None:
+        from .models import UnitLocation
+
+        version = get_unit_locations_version()
+        ttl = getattr(settings, "UNIT_LOCATION_INDEX_TTL", 300)
+        if version == self._version and time.monotonic() - self._built_at < ttl:
+            return
+        with self._lock:
+            if version == self._version and time.monotonic() - self._built_at < ttl:
+                return
+            self.build(UnitLocation.objects.values_list("id", "latitude", "longitude"))
+            self._version = version
+            self._built_at = time.monotonic()
+
+    def candidates(self, cells, size: int, latitude: float, longitude: float, radius_m: float) -> np.ndarray:
+        dlat = radius_m / METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(latitude) + dlat, 90.0)))
+        dlon = radius_m / (METERS_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        lat_range = range(
+            math.floor((latitude - dlat) / self.cell_size),
+            math.floor((latitude + dlat) / self.cell_size) + 1,
+        )
+        lon_first = math.floor((longitude + 180 - dlon) / self.cell_size)
+        lon_last = math.floor((longitude + 180 + dlon) / self.cell_size)
+        if (lon_last - lon_first + 1) * len(lat_range) > len(cells):
+            # The window spans more cells than are occupied (sparse index or close to a pole).
+            return np.arange(size)
+        found = [
+            cells[key]
+            for lat_cell in lat_range
+            for lon_cell in range(lon_first, lon_last + 1)
+            if (key := (lat_cell, lon_cell % self.lon_cells)) in cells
+        ]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def nearby(self, latitude: float, longitude: float, radius_m: float) -> list[int]:
+        self.refresh()
+        cells, ids, latitudes, longitudes = self._data
+        indexes = self.candidates(cells, len(ids), latitude, longitude, radius_m)
+        if not indexes.size:
+            return []
+        dist = distances(latitude, longitude, latitudes[indexes], longitudes[indexes]) * 1000
+        return ids[indexes[dist <= radius_m]].tolist()
+
+
+unit_location_index = UnitLocationIndex()
@@ -0,0 +1,91 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AthleteStats, Run
+from .versions import bump_version
+
+ATHLETE_STATS_VERSION = "athlete_stats"
+
+ATHLETE_STATS_AGGREGATES = {
+    "finished_runs": Count("id"),
+    "total_distance": Coalesce(Sum("distance"), Value(0.0)),
+    "total_time": Coalesce(Sum("run_time_seconds"), Value(0)),
+    "best_speed": Coalesce(Max("speed"), Value(0.0)),
+    "speed_sum": Coalesce(Sum("speed"), Value(0.0)),
+    "longest_run": Coalesce(Max("distance"), Value(0.0)),
+    "last_run_at": Max(Coalesce("last_position_at", "created_at")),
+}
+ATHLETE_STATS_FIELDS = list(ATHLETE_STATS_AGGREGATES)
+
+
+def record_finished_run(run: Run) -> None:
+    finished_at = run.last_position_at or run.created_at
+    stats = AthleteStats.objects.filter(athlete_id=run.athlete_id)
+    # A single UPDATE in the steady state, the row is only created for the athlete's first finished run.
+    while not stats.update(
+        finished_runs=F("finished_runs") + 1,
+        total_distance=F("total_distance") + run.distance,
+        total_time=F("total_time") + run.run_time_seconds,
+        best_speed=Greatest("best_speed", Value(run.speed)),
+        speed_sum=F("speed_sum") + run.speed,
+        longest_run=Greatest("longest_run", Value(run.distance)),
+        last_run_at=Coalesce(Greatest("last_run_at", Value(finished_at)), Value(finished_at)),
+    ):
+        try:
+            with transaction.atomic():
+                AthleteStats.objects.create(
+                    athlete_id=run.athlete_id,
+                    finished_runs=1,
+                    total_distance=run.distance,
+                    total_time=run.run_time_seconds,
+                    best_speed=run.speed,
+                    speed_sum=run.speed,
+                    longest_run=run.distance,
+                    last_run_at=finished_at,
+                )
+            return
+        except IntegrityError:
+            # Created by a concurrent first run, the next UPDATE counts this one on top of it.
+            pass
+
+
+def refresh_athlete_stats(athlete_id: int) -> None:
+    # Removing a run can lower best_speed and longest_run, so the athlete's row is aggregated again.
+    row = Run.objects.filter(status="finished", athlete_id=athlete_id).aggregate(**ATHLETE_STATS_AGGREGATES)
+    if row["finished_runs"]:
+        _save_stats([AthleteStats(athlete_id=athlete_id, **row)])
+    else:
+        AthleteStats.objects.filter(athlete_id=athlete_id).delete()
+    bump_version(ATHLETE_STATS_VERSION)
+
+
+def rebuild_athlete_stats(athlete_ids=None, chunk_size: int = 1000) -> int:
+    runs = Run.objects.filter(status="finished")
+    if athlete_ids is not None:
+        runs = runs.filter(athlete_id__in=athlete_ids)
+    rows = runs.values("athlete_id").annotate(**ATHLETE_STATS_AGGREGATES).order_by("athlete_id")
+    stale = AthleteStats.objects.exclude(athlete_id__in=runs.values("athlete_id"))
+    if athlete_ids is not None:
+        stale = stale.filter(athlete_id__in=athlete_ids)
+    stale.delete()
+    rebuilt, chunk = 0, []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(AthleteStats(**row))
+        if len(chunk) >= chunk_size:
+            rebuilt += _save_stats(chunk)
+            chunk = []
+    rebuilt += _save_stats(chunk)
+    bump_version(ATHLETE_STATS_VERSION)
+    return rebuilt
+
+
+def _save_stats(stats: list[AthleteStats]) -> int:
+    if stats:
+        AthleteStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=["athlete"],
+            update_fields=ATHLETE_STATS_FIELDS,
+        )
+    return len(stats)
@@ -0,0 +1,252 @@
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice, repeat
+
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .challenges import evaluate_challenges
+from .distance import segment_distances
+from .leaderboards import rebuild_leaderboards
+from .models import Run, Position, Subscribe, CoachRate, UnitLocation, UnitAthleteRelation
+from .spatial import invalidate_unit_locations
+from .stats import rebuild_athlete_stats
+
+CITY_LATITUDE = 55.75
+CITY_LONGITUDE = 37.62
+METERS_PER_DEGREE = 111_320.0
+POSITION_COLUMNS = ("run_id", "latitude", "longitude", "date_time", "speed", "distance")
+MAX_ROWS_PER_INSERT = 1000
+
+
+def make_track(task: tuple[int, int, int, str]) -> tuple[np.ndarray, ...]:
+    # Runs in worker processes: plain arguments in, arrays out, no ORM.
+    seed, points, interval, backend = task
+    rng = np.random.default_rng(seed)
+    pace = rng.uniform(2.0, 4.5)
+    heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.15, points))
+    step = pace * interval * rng.uniform(0.8, 1.2, points) / METERS_PER_DEGREE
+    step[0] = 0.0
+    start_latitude = CITY_LATITUDE + rng.normal(0, 0.05)
+    start_longitude = CITY_LONGITUDE + rng.normal(0, 0.08)
+    latitudes = start_latitude + np.cumsum(np.cos(heading) * step)
+    longitudes = start_longitude + np.cumsum(np.sin(heading) * step / np.cos(np.radians(start_latitude)))
+    segments = segment_distances(latitudes, longitudes, backend)
+    rounded = np.round(segments, 2)
+    # Same values the position endpoints store: cumulative rounded km and per-segment m/s.
+    distances = np.concatenate(([0.0], np.cumsum(rounded)))
+    speeds = np.concatenate(([0.0], np.round(rounded * 1000 / interval, 2)))
+    return latitudes, longitudes, distances, speeds, np.array([segments.sum()])
+
+
+def insert_rows(model, columns: tuple[str, ...], rows: list[tuple]) -> int:
+    # Multi-row INSERT of already adapted values, bulk_create spends most of its time preparing each value.
+    if not rows:
+        return 0
+    fields = [model._meta.get_field(column) for column in columns]
+    quote = connection.ops.quote_name
+    rows_per_statement = min(connection.ops.bulk_batch_size(fields, rows), MAX_ROWS_PER_INSERT)
+    placeholders = f"({', '.join(['%s'] * len(columns))})"
+    head = f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) VALUES "
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), rows_per_statement):
+            chunk = rows[start:start + rows_per_statement]
+            cursor.execute(head + ", ".join([placeholders] * len(chunk)), list(chain.from_iterable(chunk)))
+    return len(rows)
+
+
+class WorldStats:
+    def __init__(self):
+        self.users = 0
+        self.units = 0
+        self.runs = 0
+        self.positions = 0
+        self.seconds = {}
+
+
+class WorldGenerator:
+    def __init__(
+        self,
+        coaches: int,
+        athletes: int,
+        runs: int,
+        points: int,
+        interval: int = 5,
+        units: int = 200,
+        days: int = 90,
+        workers: int = 0,
+        chunk_size: int = 10000,
+        seed: int = 0,
+        prefix: str = "gen",
+        on_progress=None,
+    ):
+        self.coaches = coaches
+        self.athletes = athletes
+        self.runs = runs
+        self.points = max(points, 2)
+        self.interval = interval
+        self.units = units
+        self.days = days
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.prefix = prefix
+        self.on_progress = on_progress
+        self.rng = np.random.default_rng(seed)
+        self.stats = WorldStats()
+
+    def generate(self) -> WorldStats:
+        coaches, athletes = self.timed("users", self.create_users)
+        self.timed("subscriptions", self.create_subscriptions, coaches, athletes)
+        units = self.timed("units", self.create_units)
+        self.timed("collected units", self.collect_units, athletes, units)
+        self.timed("runs", self.create_runs, athletes)
+        self.timed("stats", self.finalize)
+        return self.stats
+
+    def timed(self, step: str, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.stats.seconds[step] = time.perf_counter() - start
+        return result
+
+    def create_users(self) -> tuple[list[User], list[User]]:
+        users = [
+            User(username=f"{self.prefix}_coach_{i}", first_name=f"Coach{i}", last_name=self.prefix, is_staff=True)
+            for i in range(self.coaches)
+        ] + [
+            User(username=f"{self.prefix}_athlete_{i}", first_name=f"Athlete{i}", last_name=self.prefix)
+            for i in range(self.athletes)
+        ]
+        for user in users:
+            user.password = "!"
+        users = User.objects.bulk_create(users, batch_size=self.chunk_size)
+        self.stats.users = len(users)
+        return users[:self.coaches], users[self.coaches:]
+
+    def create_subscriptions(self, coaches: list[User], athletes: list[User]) -> None:
+        if not coaches:
+            return
+        coach_indexes = self.rng.integers(0, len(coaches), len(athletes))
+        rated = self.rng.random(len(athletes)) < 0.5
+        ratings = self.rng.integers(1, 6, len(athletes))
+        Subscribe.objects.bulk_create(
+            (Subscribe(coach=coaches[c], athlete=athlete) for c, athlete in zip(coach_indexes, athletes)),
+            batch_size=self.chunk_size,
+        )
+        CoachRate.objects.bulk_create(
+            (
+                CoachRate(coach=coaches[c], athlete=athlete, rating=int(rating))
+                for c, athlete, is_rated, rating in zip(coach_indexes, athletes, rated, ratings)
+                if is_rated
+            ),
+            batch_size=self.chunk_size,
+        )
+
+    def create_units(self) -> list[UnitLocation]:
+        uids = self.rng.choice(2 ** 32, self.units, replace=False)
+        UnitLocation.objects.bulk_create(
+            (
+                UnitLocation(
+                    name=f"{self.prefix} unit {i}",
+                    uid=f"{uid:08x}",
+                    latitude=CITY_LATITUDE + self.rng.normal(0, 0.05),
+                    longitude=CITY_LONGITUDE + self.rng.normal(0, 0.08),
+                    picture=f"https://example.com/units/{uid:08x}.png",
+                    value=int(self.rng.integers(1, 100)),
+                )
+                for i, uid in enumerate(uids.tolist())
+            ),
+            batch_size=self.chunk_size,
+            ignore_conflicts=True,
+        )
+        units = list(UnitLocation.objects.filter(uid__in=[f"{uid:08x}" for uid in uids.tolist()]))
+        self.stats.units = len(units)
+        return units
+
+    def collect_units(self, athletes: list[User], units: list[UnitLocation]) -> None:
+        if not units:
+            return
+        UnitAthleteRelation.objects.bulk_create(
+            (
+                UnitAthleteRelation(athlete=athlete, unit=units[i])
+                for athlete in athletes
+                for i in self.rng.choice(len(units), min(int(self.rng.integers(0, 4)), len(units)), replace=False)
+            ),
+            batch_size=self.chunk_size,
+        )
+
+    def run_tasks(self, athletes: list[User]):
+        backend = getattr(settings, "DISTANCE_BACKEND", None)
+        now = timezone.now()
+        seeds = self.rng.integers(0, 2 ** 32, (len(athletes), self.runs))
+        offsets = self.rng.uniform(0, self.days * 24 * 3600, (len(athletes), self.runs))
+        for a, athlete in enumerate(athletes):
+            for r in range(self.runs):
+                start = now - datetime.timedelta(seconds=float(offsets[a, r]))
+                yield athlete, start, (int(seeds[a, r]), self.points, self.interval, backend)
+
+    def create_runs(self, athletes: list[User]) -> None:
+        tasks = self.run_tasks(athletes)
+        # Enough runs per batch to fill a few position chunks, results are consumed as they arrive.
+        batch_size = max(1, self.chunk_size // self.points) * max(self.workers, 1) * 4
+        # Workers started with spawn/forkserver import this module, so they need Django set up first.
+        executor = ProcessPoolExecutor(self.workers, initializer=django.setup) if self.workers > 1 else None
+        try:
+            while batch := list(islice(tasks, batch_size)):
+                task_args = [task for _, _, task in batch]
+                tracks = executor.map(make_track, task_args) if executor else map(make_track, task_args)
+                self.save_runs(batch, tracks)
+                if self.on_progress:
+                    self.on_progress(self.stats)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def save_runs(self, batch, tracks) -> None:
+        step = datetime.timedelta(seconds=self.interval)
+        with transaction.atomic():
+            runs, positions = [], []
+            for (athlete, start, _), track in zip(batch, tracks):
+                latitudes, longitudes, distances, speeds, total = track
+                run = Run(
+                    athlete=athlete,
+                    comment=f"{self.prefix} run",
+                    status="finished",
+                    distance=round(float(total[0]), 2),
+                    run_time_seconds=(self.points - 1) * self.interval,
+                    speed=round(float(speeds.sum()) / self.points, 2),
+                    positions_count=self.points,
+                    positions_distance=float(total[0]),
+                    positions_speed_sum=float(speeds.sum()),
+                    first_position_at=start,
+                    last_position_at=start + step * (self.points - 1),
+                )
+                runs.append((run, start, latitudes.tolist(), longitudes.tolist(), distances.tolist(), speeds.tolist()))
+            Run.objects.bulk_create([run for run, *_ in runs], batch_size=self.chunk_size)
+            adapt_datetime = connection.ops.adapt_datetimefield_value
+            for run, start, latitudes, longitudes, distances, speeds in runs:
+                positions.extend(zip(
+                    repeat(run.pk),
+                    latitudes,
+                    longitudes,
+                    (adapt_datetime(start + step * i) for i in range(len(latitudes))),
+                    speeds,
+                    distances,
+                ))
+                if len(positions) >= self.chunk_size:
+                    self.stats.positions += insert_rows(Position, POSITION_COLUMNS, positions)
+                    positions = []
+            self.stats.positions += insert_rows(Position, POSITION_COLUMNS, positions)
+            self.stats.runs += len(runs)
+
+    def finalize(self) -> None:
+        rebuild_athlete_stats()
+        rebuild_leaderboards()
+        evaluate_challenges()
+        invalidate_unit_locations()
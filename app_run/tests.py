@@ -1,3 +1,1011 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import StreamingHttpResponse
+from django.test import Client, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .benchmark import SCENARIOS, STOP_POINTS, BenchmarkWorld, run_benchmark, run_scenario
+from .distance import BACKENDS, distances, segment_distances
+from .exporters import POSITION_EXPORT_COLUMNS, RUN_EXPORT_COLUMNS, XLSX_CONTENT_TYPE, write_xlsx
+from .importers import ImportStats, import_run, iter_gpx_points, iter_tcx_points
+from .leaderboards import rebuild_leaderboards
+from .metrics import registry, serializer_timer
+from .models import (
+    Run,
+    Position,
+    UnitLocation,
+    UnitAthleteRelation,
+    Challenge,
+    AthleteStats,
+    LeaderboardEntry,
+    Subscribe,
+    CoachRate,
+)
+from .querycount import query_budget
+from .services import cache_last_position, RUN_VERSION
+from .simplify import simplify_track
+from .spatial import CELL_SIZE_DEG, UnitLocationIndex, unit_location_index
+from .stats import rebuild_athlete_stats
+from .synthetic import WorldGenerator
+from .tracks import TRACK_HEADER, PackedTrack, pack_track, compact_run, get_run_positions
+from .uploads import claim_upload_job, process_upload_job
+from .versions import VERSION_KEY
+from .serializers import RunSerializer
+from .views import RunViewSet, UserReadOnlyViewSet, PositionViewSet
+
+START = datetime.datetime(2024, 5, 1, 10, 0, tzinfo=datetime.timezone.utc)
+
+
+def make_points(count: int, start: int = 0, days: int = 0) -> list[dict]:
+    return [
+        {
+            "latitude": 55.75 + (start + i) * 0.0003,
+            "longitude": 37.62 + (start + i) % 3 * 0.0002,
+            "date_time": (START + datetime.timedelta(days=days, seconds=5 * (start + i))).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.athlete = User.objects.create(username="athlete", first_name="Ivan", last_name="Petrov")
+        self.coach = User.objects.create(username="coach", first_name="Anna", last_name="Smirnova", is_staff=True)
+
+    def create_run(self, status: str = "in_progress", athlete: User | None = None) -> Run:
+        return Run.objects.create(athlete=athlete or self.athlete, comment="test", status=status)
+
+    def post_points(self, run: Run, points: list[dict]) -> None:
+        for point in points:
+            response = self.client.post("/api/positions/", {"run": run.id, **point}, format="json")
+            self.assertEqual(response.status_code, 201, response.content)
+
+    def upload(self, rows: list[tuple], query: str = ""):
+        header = ["name", "uid", "value", "latitude", "longitude", "picture"]
+        with write_xlsx("units", header, rows) as file:
+            upload = SimpleUploadedFile("units.xlsx", file.read(), XLSX_CONTENT_TYPE)
+        return self.client.post(f"/api/upload_file/{query}", {"file": upload}, format="multipart")
+
+    def track(self, run: Run) -> list[tuple]:
+        return list(Position.objects.filter(run=run).order_by("id").values_list("date_time", "speed", "distance"))
+
+
+class DistanceTests(TestCase):
+    # Moscow - St Petersburg, along the equator, across the antimeridian, near a pole and a 10 m step.
+    pairs = [
+        (55.7558, 37.6173, 59.9343, 30.3351),
+        (0.0, 0.0, 0.0, 1.0),
+        (-16.5, 179.9, -16.6, -179.8),
+        (89.5, 0.0, 89.5, 180.0),
+        (55.75, 37.62, 55.75009, 37.62),
+    ]
+
+    def test_backends_against_geodesic(self):
+        lat1, lon1, lat2, lon2 = np.array(self.pairs).T
+        expected = distances(lat1, lon1, lat2, lon2, "geodesic")
+        self.assertAlmostEqual(float(expected[1]), 111.319491, places=5)
+        self.assertAlmostEqual(float(expected[4]), 0.0100, places=4)
+        # Errors in meters: vincenty solves the same ellipsoid, haversine assumes a sphere.
+        vincenty = distances(lat1, lon1, lat2, lon2, "vincenty")
+        self.assertLess(float(np.abs(vincenty - expected).max()) * 1000, 1e-3)
+        haversine = distances(lat1, lon1, lat2, lon2, "haversine")
+        self.assertLess(float((np.abs(haversine - expected) / expected).max()), 0.005)
+
+    def test_coincident_and_antipodal_points(self):
+        for name in BACKENDS:
+            self.assertEqual(float(distances(55.75, 37.62, 55.75, 37.62, name)), 0.0, name)
+        lat1, lon1, lat2, lon2 = np.array([(0.0, 0.0, 0.0, 180.0), (0.5, 0.0, -0.5, 179.7)]).T
+        expected = distances(lat1, lon1, lat2, lon2, "geodesic")
+        self.assertAlmostEqual(float(expected[0]), 20003.931458, places=5)
+        # Vincenty doesn't converge here and falls back to the exact solution.
+        np.testing.assert_allclose(distances(lat1, lon1, lat2, lon2, "vincenty"), expected, atol=1e-6)
+        np.testing.assert_allclose(distances(lat1, lon1, lat2, lon2, "haversine"), expected, rtol=0.005)
+
+    def test_segments_and_backend_setting(self):
+        latitudes, longitudes = [55.75, 55.76, 55.77], [37.62, 37.62, 37.63]
+        np.testing.assert_allclose(
+            segment_distances(latitudes, longitudes, "vincenty"),
+            distances(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:], "geodesic"),
+            atol=1e-6,
+        )
+        self.assertEqual(segment_distances([55.75], [37.62]).size, 0)
+        with override_settings(DISTANCE_BACKEND="haversine"):
+            self.assertEqual(float(distances(0, 0, 0, 1)), float(distances(0, 0, 0, 1, "haversine")))
+        with self.assertRaises(ValueError):
+            distances(0, 0, 0, 1, "flat")
+
+
+class SpatialIndexTests(APITestCase):
+    def brute_force(self, rows, latitude: float, longitude: float, radius_m: float) -> list[int]:
+        ids, latitudes, longitudes = map(np.array, zip(*rows))
+        return sorted(ids[distances(latitude, longitude, latitudes, longitudes) * 1000 <= radius_m].tolist())
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        queries = [
+            (55.75, 37.62),
+            # On cell corners, points in all four neighbouring cells are in range.
+            (55.75 - CELL_SIZE_DEG * 5, 37.62 + CELL_SIZE_DEG * 3),
+            (0.0, 0.0),
+            (-16.5, 179.9995),
+            (78.22, 15.65),
+            (89.9995, 10.0),
+        ]
+        rows = []
+        for latitude, longitude in queries:
+            for _ in range(60):
+                rows.append((
+                    len(rows) + 1,
+                    min(latitude + rng.normal(0, 0.002), 90.0),
+                    (longitude + rng.normal(0, 0.004) + 180) % 360 - 180,
+                ))
+        index = UnitLocationIndex()
+        index.build(rows)
+        index.refresh = lambda: None
+        for latitude, longitude in queries:
+            for radius_m in (0, 50, 100, 500):
+                self.assertEqual(
+                    sorted(index.nearby(latitude, longitude, radius_m)),
+                    self.brute_force(rows, latitude, longitude, radius_m),
+                    (latitude, longitude, radius_m),
+                )
+        self.assertGreater(len(index.nearby(89.9995, 10.0, 500)), 0)
+
+    def test_unit_location_changes_invalidate(self):
+        data = {"name": "coin", "uid": "c0", "value": 1, "picture": "https://example.com/c0.png"}
+        unit = UnitLocation.objects.create(latitude=55.75, longitude=37.62, **data)
+        self.assertEqual(unit_location_index.nearby(55.7502, 37.62, 100), [unit.id])
+        unit.latitude = 55.76
+        unit.save()
+        self.assertEqual(unit_location_index.nearby(55.7502, 37.62, 100), [])
+        self.assertEqual(unit_location_index.nearby(55.76, 37.62, 100), [unit.id])
+        unit.delete()
+        self.assertEqual(unit_location_index.nearby(55.76, 37.62, 100), [])
+
+
+class LastPositionCacheTests(APITestCase):
+    def test_stale_cache_entry_is_not_used(self):
+        run, expected = self.create_run(), self.create_run()
+        self.post_points(run, make_points(2))
+        # Another worker's cache still holds the first point as the last one.
+        first = Position.objects.filter(run=run).order_by("id").first()
+        cache_last_position(first, 1)
+        self.post_points(run, make_points(1, start=2))
+        self.post_points(expected, make_points(3))
+        self.assertEqual(self.track(run), self.track(expected))
+
+
+class PositionPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.run = self.create_run()
+        self.post_points(self.run, make_points(10))
+        self.client.post(f"/api/runs/{self.run.id}/stop/")
+
+    def pages(self, query: str) -> list:
+        pages, url = [], f"/api/positions/?run={self.run.id}&{query}"
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data)
+            url = data.get("next") if isinstance(data, dict) else None
+        return pages
+
+    def test_keyset_pages_cover_the_track_in_order(self):
+        pages = self.pages("size=4")
+        self.assertEqual([len(page["results"]) for page in pages], [4, 4, 2])
+        ids = [position["id"] for page in pages for position in page["results"]]
+        self.assertEqual(ids, list(Position.objects.filter(run=self.run).order_by("id").values_list("id", flat=True)))
+        previous = self.client.get(pages[-1]["previous"]).json()
+        self.assertEqual(previous["results"], pages[-2]["results"])
+
+    def test_page_number_pagination(self):
+        data = self.client.get(f"/api/positions/?run={self.run.id}&page=3&size=4").json()
+        self.assertEqual(data["count"], 10)
+        self.assertIsNone(data["next"])
+        self.assertEqual(len(data["results"]), 2)
+
+    def test_packed_track_is_paginated_like_rows(self):
+        # Packing rounds the values, so pages are compared by shape, ids and links.
+        def shape(page):
+            if isinstance(page, list):
+                return [position["id"] for position in page]
+            return {**page, "results": [position["id"] for position in page["results"]]}
+
+        queries = ["", "size=4", "page=2&size=4", "size=3&count=estimate"]
+        before = {query: [shape(page) for page in self.pages(query)] for query in queries}
+        compact_run(Run.objects.get(pk=self.run.pk))
+        self.assertFalse(Position.objects.filter(run=self.run).exists())
+        for query in queries:
+            self.assertEqual([shape(page) for page in self.pages(query)], before[query], query)
+
+
+class PositionIngestTests(APITestCase):
+    def test_batch_matches_single_points(self):
+        single, batch = self.create_run(), self.create_run()
+        points = make_points(12)
+        self.post_points(single, points)
+        for chunk in (points[:5], points[5:]):
+            response = self.client.post("/api/positions/batch/", {"run": batch.id, "positions": chunk}, format="json")
+            self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.track(batch), self.track(single))
+        single.refresh_from_db()
+        batch.refresh_from_db()
+        for field in ("positions_count", "first_position_at", "last_position_at"):
+            self.assertEqual(getattr(batch, field), getattr(single, field), field)
+        for field in ("positions_distance", "positions_speed_sum"):
+            self.assertAlmostEqual(getattr(batch, field), getattr(single, field), msg=field)
+
+    def test_batch_rejects_finished_run(self):
+        run = self.create_run(status="finished")
+        data = {"run": run.id, "positions": make_points(2)}
+        response = self.client.post("/api/positions/batch/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Position.objects.filter(run=run).exists())
+
+
+class PositionEditTests(APITestCase):
+    def assertStopsLike(self, run: Run, points: list[dict]) -> None:
+        expected = self.create_run()
+        self.post_points(expected, points)
+        for stopped in (run, expected):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.post(f"/api/runs/{stopped.id}/stop/").status_code, 200)
+            stopped.refresh_from_db()
+        for field in ("positions_count", "first_position_at", "last_position_at", "distance", "run_time_seconds"):
+            self.assertEqual(getattr(run, field), getattr(expected, field), field)
+        self.assertAlmostEqual(run.positions_distance, expected.positions_distance)
+
+    def test_delete_corrects_run_totals(self):
+        run = self.create_run()
+        points = make_points(4)
+        self.post_points(run, points)
+        last = Position.objects.filter(run=run).latest("id")
+        self.assertEqual(self.client.delete(f"/api/positions/{last.id}/").status_code, 204)
+        self.assertStopsLike(run, points[:3])
+
+    def test_update_corrects_run_totals(self):
+        run = self.create_run()
+        points = make_points(4)
+        self.post_points(run, points)
+        position = Position.objects.filter(run=run).order_by("id")[1]
+        points[1] = {**points[1], "latitude": 55.76}
+        response = self.client.patch(f"/api/positions/{position.id}/", {"latitude": 55.76}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertStopsLike(run, points)
+
+    def test_run_time_counts_whole_days(self):
+        run = self.create_run()
+        self.post_points(run, make_points(1) + make_points(1, days=1, start=1))
+        response = self.client.get(f"/api/runs/{run.id}/stats/")
+        self.assertEqual(response.json()["run_time_seconds"], 24 * 60 * 60 + 5)
+
+
+class SimplifyTests(APITestCase):
+    # A straight line east, about 63 m between points, with spikes of 11 m at index 3 and 33 m at index 6.
+    latitudes = [55.75, 55.75, 55.75, 55.7501, 55.75, 55.75, 55.7503, 55.75, 55.75, 55.75]
+    longitudes = [37.62 + i * 0.001 for i in range(10)]
+
+    def test_tolerance_drops_points_closer_than_it(self):
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, tolerance=0), list(range(10)))
+        # The base of a kept spike lies off the shortcut to it, so it stays while the tolerance is below that.
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, tolerance=8), [0, 3, 5, 6, 7, 9])
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, tolerance=20), [0, 5, 6, 7, 9])
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, tolerance=50), [0, 9])
+        # A cap above the point count doesn't switch the tolerance off.
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, tolerance=20, max_points=100), [0, 5, 6, 7, 9])
+
+    def test_max_points_keeps_endpoints_and_the_farthest_points(self):
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, max_points=2), [0, 9])
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, max_points=3), [0, 6, 9])
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, max_points=4), [0, 5, 6, 9])
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, tolerance=8, max_points=5), [0, 5, 6, 7, 9])
+        self.assertEqual(simplify_track(self.latitudes, self.longitudes, max_points=10), list(range(10)))
+        self.assertEqual(simplify_track(self.latitudes[:2], self.longitudes[:2], tolerance=50), [0, 1])
+
+    def test_positions_endpoint(self):
+        run = self.create_run()
+        points = make_points(10)
+        for point, latitude, longitude in zip(points, self.latitudes, self.longitudes):
+            point.update(latitude=latitude, longitude=longitude)
+        self.post_points(run, points)
+        response = self.client.get("/api/positions/", {"run": run.id, "tolerance": 20})
+        self.assertEqual(response.status_code, 200, response.content)
+        ids = list(Position.objects.filter(run=run).order_by("id").values_list("id", flat=True))
+        self.assertEqual([row["id"] for row in response.json()], [ids[i] for i in (0, 5, 6, 7, 9)])
+        response = self.client.get("/api/positions/", {"run": run.id, "max_points": 2})
+        self.assertEqual([row["id"] for row in response.json()], [ids[0], ids[9]])
+        for query in ({"tolerance": "abc"}, {"max_points": "1.5"}, {"tolerance": -1}, {"max_points": 1}):
+            response = self.client.get("/api/positions/", {"run": run.id, **query})
+            self.assertEqual(response.status_code, 400, query)
+
+
+class PackedTrackTests(TestCase):
+    def test_round_trip_within_scale(self):
+        rows = [
+            {
+                "id": 100 + i * 3,
+                "latitude": -33.8688123 + i * 0.00011,
+                # Crosses the antimeridian.
+                "longitude": 179.9999 + i * 0.00005 - (360 if i >= 3 else 0),
+                "date_time": START + datetime.timedelta(seconds=i * 5, microseconds=123456 + 7 * i),
+                "speed": 3.37 + i,
+                "distance": 0.01 * i,
+            }
+            for i in range(6)
+        ]
+        positions = PackedTrack(pack_track(rows)).positions(run_id=7)
+        self.assertEqual([position.id for position in positions], [row["id"] for row in rows])
+        for position, row in zip(positions, rows):
+            self.assertEqual(position.run_id, 7)
+            self.assertAlmostEqual(position.latitude, row["latitude"], delta=1e-7)
+            self.assertAlmostEqual(position.longitude, row["longitude"], delta=1e-7)
+            self.assertEqual(position.date_time, row["date_time"])
+            self.assertAlmostEqual(position.speed, row["speed"], places=2)
+            self.assertAlmostEqual(position.distance, row["distance"], places=2)
+
+    def test_version_1_tracks_read_with_millisecond_times(self):
+        rows = [
+            {
+                "id": 5 + i,
+                "latitude": 55.75,
+                "longitude": 37.62,
+                "date_time": START + datetime.timedelta(seconds=i, microseconds=123456 + 100 * i),
+                "speed": 0,
+                "distance": 0,
+            }
+            for i in range(3)
+        ]
+        data = pack_track(rows)
+        count = len(rows)
+        # Version 1 is the same layout without the trailing remainders array.
+        header = TRACK_HEADER.unpack_from(data)
+        old = TRACK_HEADER.pack(header[0], 1, *header[2:]) + data[TRACK_HEADER.size:-count * 4]
+        times = [position.date_time for position in PackedTrack(old).positions(run_id=1)]
+        # Offsets from the exact base time were whole milliseconds.
+        self.assertEqual(times, [START + datetime.timedelta(seconds=i, microseconds=123456) for i in range(count)])
+        self.assertEqual(
+            [position.date_time for position in PackedTrack(data).positions(run_id=1)],
+            [row["date_time"] for row in rows],
+        )
+
+    def test_compact_run_keeps_api_output(self):
+        client = APIClient()
+        athlete = User.objects.create(username="athlete")
+        run = Run.objects.create(athlete=athlete, comment="test", status="in_progress")
+        for i in range(4):
+            date_time = START + datetime.timedelta(seconds=5 * i, microseconds=654321 + i)
+            point = {"run": run.id, "latitude": 55.75 + i * 0.001, "longitude": 37.62, "date_time": date_time}
+            self.assertEqual(client.post("/api/positions/", point, format="json").status_code, 201)
+        before = client.get("/api/positions/", {"run": run.id}).json()
+        self.assertEqual(before[1]["date_time"], "2024-05-01T10:00:05.654322")
+        run.status = "finished"
+        run.save()
+        compact_run(run)
+        after = client.get("/api/positions/", {"run": run.id}).json()
+        self.assertEqual([row["date_time"] for row in after], [row["date_time"] for row in before])
+
+    def test_compact_run_keeps_positions_readable(self):
+        athlete = User.objects.create(username="athlete")
+        run = Run.objects.create(athlete=athlete, comment="test", status="finished")
+        Position.objects.bulk_create(
+            Position(run=run, latitude=55.75 + i * 0.001, longitude=37.62, date_time=START, distance=i / 10)
+            for i in range(5)
+        )
+        ids = list(Position.objects.filter(run=run).order_by("id").values_list("id", flat=True))
+        compact_run(run)
+        self.assertFalse(Position.objects.filter(run=run).exists())
+        self.assertEqual([position.id for position in get_run_positions(run.id)], ids)
+        with self.assertRaises(ValueError):
+            compact_run(Run.objects.create(athlete=athlete, comment="test", status="in_progress"))
+
+
+class UploadTests(APITestCase):
+    def test_upsert_reports_rejected_rows(self):
+        rows = [
+            ("Coin", "a1", 10, 55.75, 37.62, "https://example.com/a1.png"),
+            ("Bad", "a2", 10, 95.0, 37.62, "https://example.com/a2.png"),
+            ("Gem", "a3", 20, 55.76, 37.63, "not a url"),
+        ]
+        response = self.upload(rows)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"row": 3, "values": list(rows[1])}, {"row": 4, "values": list(rows[2])}])
+        self.assertEqual(list(UnitLocation.objects.values_list("uid", "name")), [("a1", "Coin")])
+
+        response = self.upload([("Big coin", "a1", 50, 55.75, 37.62, "https://example.com/a1.png")])
+        self.assertEqual(response.json(), [])
+        self.assertEqual(list(UnitLocation.objects.values_list("uid", "name", "value")), [("a1", "Big coin", 50)])
+
+    def test_async_job_reports_rows_like_sync_upload(self):
+        rows = [("Coin", "b1", 10, 55.75, 37.62, "https://example.com/b1.png"), ("", "b2", 1, 0, 0, "x")]
+        response = self.upload(rows, "?async=1")
+        self.assertEqual(response.status_code, 202)
+        job = process_upload_job(claim_upload_job())
+        self.assertEqual(job.status, "finished")
+        self.assertEqual(job.rejected_rows, [{"row": 3, "values": [None, "b2", 1, 0, 0, "x"]}])
+        self.assertEqual(self.client.get(f"/api/upload_jobs/{job.id}/").json()["rows_rejected"], 1)
+        self.assertTrue(UnitLocation.objects.filter(uid="b1").exists())
+
+
+class ChallengeTests(APITestCase):
+    def test_stop_awards_challenge(self):
+        Run.objects.bulk_create(Run(athlete=self.athlete, comment="old", status="finished") for _ in range(9))
+        run = self.create_run()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/runs/{run.id}/stop/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Challenge.objects.filter(athlete=self.athlete).values_list("full_name", flat=True)),
+            ["Сделай 10 Забегов!"],
+        )
+
+    def test_import_awards_challenge(self):
+        # About 2.1 km in 525 seconds.
+        lines = ["Lat,Lon,Time"] + [
+            f"{55.75 + i * 0.0009},37.62,{(START + datetime.timedelta(seconds=25 * i)).isoformat()}" for i in range(22)
+        ]
+        file = SimpleUploadedFile("run.csv", "\n".join(lines).encode(), "text/csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            data = {"file": file, "athlete": self.athlete.id}
+            response = self.client.post("/api/runs/import/", data, format="multipart")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["status"], "finished")
+        self.assertEqual(
+            list(Challenge.objects.filter(athlete=self.athlete).values_list("full_name", flat=True)),
+            ["Пробеги 2 километра меньше чем за 10 минут!"],
+        )
+
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" {xmlns}>
+  <trk><trkseg>
+    <trkpt lat="55.75" lon="37.62"><ele>150</ele><time>2024-05-01T10:00:00Z</time></trkpt>
+    <trkpt lat="55.7503" lon="37.62"><time>2024-05-01T10:00:05Z</time></trkpt>
+    <trkpt lat="55.7506"><time>2024-05-01T10:00:10Z</time></trkpt>
+    <trkpt lat="55.7509" lon="37.62"></trkpt>
+    <trkpt lat="55.7512" lon="37.62"><time>2024-05-01T10:00:20</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+TCX = """<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+  <Activities><Activity Sport="Running"><Lap StartTime="2024-05-01T10:00:00Z"><Track>
+    <Trackpoint>
+      <Time>2024-05-01T10:00:00Z</Time>
+      <Position><LatitudeDegrees>55.75</LatitudeDegrees><LongitudeDegrees>37.62</LongitudeDegrees></Position>
+      <HeartRateBpm><Value>120</Value></HeartRateBpm>
+    </Trackpoint>
+    <Trackpoint><Time>2024-05-01T10:00:05Z</Time></Trackpoint>
+    <Trackpoint>
+      <Time>2024-05-01T10:00:10Z</Time>
+      <Position><LatitudeDegrees>55.7506</LatitudeDegrees><LongitudeDegrees>37.62</LongitudeDegrees></Position>
+    </Trackpoint>
+  </Track></Lap></Activity></Activities>
+</TrainingCenterDatabase>
+"""
+EXPECTED_GPX_POINTS = [
+    (55.75, 37.62, START),
+    (55.7503, 37.62, START + datetime.timedelta(seconds=5)),
+    (55.7512, 37.62, START + datetime.timedelta(seconds=20)),
+]
+
+
+class ImporterTests(APITestCase):
+    def read(self, reader, document: str) -> tuple[list[tuple], int]:
+        stats = ImportStats()
+        points = [
+            (point["latitude"], point["longitude"], point["date_time"])
+            for point in reader(io.BytesIO(document.encode()), stats)
+        ]
+        return points, stats.skipped
+
+    def test_gpx_with_and_without_namespace(self):
+        # Points without coordinates or time are skipped, a naive time is taken as UTC.
+        for xmlns in ('xmlns="http://www.topografix.com/GPX/1/1"', ""):
+            self.assertEqual(self.read(iter_gpx_points, GPX.format(xmlns=xmlns)), (EXPECTED_GPX_POINTS, 2), xmlns)
+
+    def test_tcx_trackpoints(self):
+        self.assertEqual(
+            self.read(iter_tcx_points, TCX),
+            ([(55.75, 37.62, START), (55.7506, 37.62, START + datetime.timedelta(seconds=10))], 1),
+        )
+
+    def test_import_run(self):
+        file = io.BytesIO(GPX.format(xmlns="").encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            run, stats = import_run(self.athlete, file, "gpx", chunk_size=2)
+        self.assertEqual((stats.points, stats.skipped), (3, 2))
+        self.assertEqual(run.status, "finished")
+        self.assertEqual(
+            list(Position.objects.filter(run=run).order_by("id").values_list("latitude", "longitude", "date_time")),
+            EXPECTED_GPX_POINTS,
+        )
+
+    def test_malformed_xml_rolls_back(self):
+        broken = GPX.format(xmlns="").replace("</trkseg>", "")
+        for chunk_size in (1, 100):
+            with self.assertRaisesMessage(ValueError, "Malformed gpx file"):
+                import_run(self.athlete, io.BytesIO(broken.encode()), "gpx", chunk_size=chunk_size)
+        self.assertFalse(Run.objects.exists())
+        self.assertFalse(Position.objects.exists())
+        file = SimpleUploadedFile("run.gpx", broken.encode(), "application/gpx+xml")
+        response = self.client.post("/api/runs/import/", {"file": file, "athlete": self.athlete.id}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Run.objects.exists())
+
+
+class AthleteStatsTests(APITestCase):
+    def finish_runs(self, count: int) -> list[Run]:
+        runs = []
+        for i in range(count):
+            run = self.create_run()
+            self.post_points(run, make_points(3 + i, start=10 * i))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.post(f"/api/runs/{run.id}/stop/").status_code, 200)
+            runs.append(run)
+        return runs
+
+    def assertStatsMatchRebuild(self) -> None:
+        incremental = sorted(AthleteStats.objects.values(), key=lambda row: row["athlete_id"])
+        rebuild_athlete_stats()
+        rebuilt = sorted(AthleteStats.objects.values(), key=lambda row: row["athlete_id"])
+        self.assertEqual(len(incremental), len(rebuilt))
+        for row, expected in zip(incremental, rebuilt):
+            for field, value in expected.items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(row[field], value, msg=field)
+                else:
+                    self.assertEqual(row[field], value, field)
+
+    def runs_finished(self) -> dict[int, int]:
+        return {user["id"]: user["runs_finished"] for user in self.client.get("/api/users/").json()}
+
+    def test_incremental_stats_match_rebuild(self):
+        self.finish_runs(3)
+        self.assertEqual(AthleteStats.objects.get().finished_runs, 3)
+        self.assertStatsMatchRebuild()
+
+    def test_deleted_run_leaves_stats(self):
+        first, longest = self.finish_runs(2)
+        self.assertEqual(self.client.delete(f"/api/runs/{longest.id}/").status_code, 204)
+        self.assertEqual(self.runs_finished()[self.athlete.id], 1)
+        first.refresh_from_db()
+        self.assertEqual(AthleteStats.objects.get().longest_run, first.distance)
+        self.assertStatsMatchRebuild()
+        self.assertEqual(self.client.delete(f"/api/runs/{first.id}/").status_code, 204)
+        self.assertEqual(self.runs_finished()[self.athlete.id], 0)
+        self.assertFalse(AthleteStats.objects.exists())
+
+    def test_reassigned_run_moves_stats(self):
+        other = User.objects.create(username="other")
+        run = self.finish_runs(2)[1]
+        response = self.client.patch(f"/api/runs/{run.id}/", {"athlete": other.id}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.runs_finished(), {self.athlete.id: 1, self.coach.id: 0, other.id: 1})
+        self.assertStatsMatchRebuild()
+
+
+class LeaderboardTests(APITestCase):
+    fields = ("period", "period_start", "athlete_id", "runs", "distance", "speed_sum", "speed")
+
+    def finish_runs(self, days: tuple[int, ...]) -> list[Run]:
+        runs = []
+        for i, day in enumerate(days):
+            run = self.create_run()
+            self.post_points(run, make_points(4 + i, days=day))
+            self.client.post(f"/api/runs/{run.id}/stop/")
+            runs.append(run)
+        return runs
+
+    def assertEntriesMatchRebuild(self) -> list[tuple]:
+        incremental = sorted(LeaderboardEntry.objects.values_list(*self.fields))
+        rebuild_leaderboards()
+        rebuilt = sorted(LeaderboardEntry.objects.values_list(*self.fields))
+        self.assertEqual([entry[:4] for entry in incremental], [entry[:4] for entry in rebuilt])
+        for entry, expected in zip(incremental, rebuilt):
+            for value, expected_value in zip(entry[4:], expected[4:]):
+                self.assertAlmostEqual(value, expected_value)
+        return incremental
+
+    def test_incremental_entries_match_rebuild(self):
+        # The second week reuses the month and all-time entries and creates a new week entry.
+        self.finish_runs((0, 1, 8))
+        self.assertEqual(
+            [(period, runs) for period, _, _, runs, *_ in self.assertEntriesMatchRebuild()],
+            [("all", 3), ("month", 3), ("week", 2), ("week", 1)],
+        )
+
+    def test_deleted_and_reassigned_runs_leave_their_buckets(self):
+        other = User.objects.create(username="other")
+        moved, deleted, _ = self.finish_runs((0, 8, 1))
+        self.assertEqual(self.client.delete(f"/api/runs/{deleted.id}/").status_code, 204)
+        response = self.client.patch(f"/api/runs/{moved.id}/", {"athlete": other.id}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        entries = self.assertEntriesMatchRebuild()
+        self.assertEqual(
+            [(period, athlete_id, runs) for period, _, athlete_id, runs, *_ in entries],
+            [
+                ("all", self.athlete.id, 1),
+                ("all", other.id, 1),
+                ("month", self.athlete.id, 1),
+                ("month", other.id, 1),
+                ("week", self.athlete.id, 1),
+                ("week", other.id, 1),
+            ],
+        )
+        date = START.date()
+        response = self.client.get("/api/leaderboard/", {"period": "week", "metric": "distance", "date": date})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(sorted(row["athlete_id"] for row in response.json()["top"]), [self.athlete.id, other.id])
+
+
+class CoachAnalyticsTests(APITestCase):
+    def test_date_range_uses_run_time_not_save_time(self):
+        Subscribe.objects.create(coach=self.coach, athlete=self.athlete)
+        run = self.create_run()
+        self.post_points(run, make_points(5))
+        self.client.post(f"/api/runs/{run.id}/stop/")
+        url = f"/api/analytics_for_coach/{self.coach.id}/"
+        run.refresh_from_db()
+        response = self.client.get(url, {"date_from": "2024-05-01", "date_to": "2024-05-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["longest_run_user"], self.athlete.id)
+        self.assertEqual(response.json()["longest_run_value"], run.distance)
+        self.assertEqual(self.client.get(url, {"date_from": "2024-05-02"}).status_code, 404)
+
+
+class ConditionalGetTests(APITestCase):
+    def get(self, url: str, etag: str | None = None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_run_etag_is_invalidated_by_stop(self):
+        run = self.create_run()
+        url = f"/api/runs/{run.id}/"
+        first = self.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("no-cache", first["Cache-Control"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url, first["ETag"]).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/runs/{run.id}/stop/")
+        finished = self.get(url, first["ETag"])
+        self.assertEqual(finished.status_code, 200)
+        self.assertEqual(finished.json()["status"], "finished")
+        self.assertNotEqual(finished["ETag"], first["ETag"])
+        not_modified = self.get(url, finished["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["Cache-Control"], finished["Cache-Control"])
+        self.assertIn("max-age=3600", not_modified["Cache-Control"])
+
+    def test_unknown_run_is_not_versioned(self):
+        response = self.get("/api/runs/999999/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertIsNone(cache.get(VERSION_KEY.format(name=RUN_VERSION.format(run_id=999999))))
+
+    def test_unit_locations_etag_is_invalidated_by_upload(self):
+        first = self.get("/api/collectible_item/")
+        self.assertEqual(self.get("/api/collectible_item/", first["ETag"]).status_code, 304)
+        self.upload([("Coin", "c1", 10, 55.75, 37.62, "https://example.com/c1.png")])
+        changed = self.get("/api/collectible_item/", first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual([unit["uid"] for unit in changed.json()], ["c1"])
+
+    @override_settings(CACHE_VERSION_TIMEOUT=0)
+    def test_version_stamps_expire(self):
+        first = self.get("/api/challenges_summary/")
+        self.assertEqual(self.get("/api/challenges_summary/", first["ETag"]).status_code, 200)
+
+
+class UserFieldsTests(APITestCase):
+    def test_list_rejects_retrieve_only_fields(self):
+        response = self.client.get("/api/users/", {"fields": "coach"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("coach", response.json()["fields"])
+        response = self.client.get("/api/users/", {"fields": "id,username"})
+        self.assertEqual(
+            response.json(), [{"id": user.id, "username": user.username} for user in (self.athlete, self.coach)]
+        )
+
+    def test_retrieve_checks_fields_of_the_user_type(self):
+        Subscribe.objects.create(coach=self.coach, athlete=self.athlete)
+        response = self.client.get(f"/api/users/{self.athlete.id}/", {"fields": "coach"})
+        self.assertEqual(response.json(), {"coach": self.coach.id})
+        self.assertEqual(self.client.get(f"/api/users/{self.athlete.id}/", {"fields": "athletes"}).status_code, 400)
+        response = self.client.get(f"/api/users/{self.coach.id}/", {"fields": "athletes"})
+        self.assertEqual(response.json(), {"athletes": [self.athlete.id]})
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        WorldGenerator(coaches=2, athletes=6, runs=1, points=20, units=5, prefix="bench").generate()
+        self.world = BenchmarkWorld("bench", interval=5)
+
+    def test_cold_scenarios_reach_the_database(self):
+        results = run_benchmark(self.world, ["challenges_summary", "challenges_summary_cold"], 4, warmup=1)
+        self.assertEqual(results["challenges_summary"]["queries_max"], 0)
+        self.assertGreater(results["challenges_summary_cold"]["queries_mean"], 0)
+        results = run_benchmark(self.world, ["coach_analytics_cold"], 4, warmup=1)
+        self.assertGreater(results["coach_analytics_cold"]["queries_mean"], 0)
+        self.assertFalse(any(result["errors"] for result in results.values()))
+
+    def test_stopped_runs_have_positions(self):
+        requests = SCENARIOS["run_stop"](self.world, 2)
+        run_ids = [int(request.path.split("/")[3]) for request in requests]
+        self.assertEqual(
+            list(Run.objects.filter(pk__in=run_ids).values_list("positions_count", flat=True)), [STOP_POINTS] * 2
+        )
+        self.assertEqual(run_scenario(Client(), requests)["errors"], 0)
+        self.assertEqual(set(Run.objects.filter(pk__in=run_ids).values_list("status", flat=True)), {"finished"})
+
+
+class QueryBudgetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Several users and runs, so a per-row query shows up as a repeated shape.
+        self.athletes = [User.objects.create(username=f"athlete{i}") for i in range(6)]
+        self.coaches = [User.objects.create(username=f"coach{i}", is_staff=True) for i in range(3)]
+        Subscribe.objects.bulk_create(
+            Subscribe(coach=self.coaches[i % 3], athlete=athlete) for i, athlete in enumerate(self.athletes)
+        )
+        for athlete in self.athletes:
+            for days in range(2):
+                run = self.create_run(athlete=athlete)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        "/api/positions/batch/", {"run": run.id, "positions": make_points(5, days=days)}, format="json"
+                    )
+                    self.client.post(f"/api/runs/{run.id}/stop/")
+        self.run = self.create_run(athlete=self.athletes[0])
+        self.post_points(self.run, make_points(2))
+
+    def assertWithinBudget(self, max_queries: int, method: str, path: str, data=None, status: int = 200):
+        with self.captureOnCommitCallbacks(execute=True), query_budget(max_queries, max_duplicates=1):
+            response = getattr(self.client, method)(path, data, format="json")
+        self.assertEqual(response.status_code, status, response.content)
+
+    def test_users(self):
+        self.assertWithinBudget(2, "get", "/api/users/")
+        self.assertWithinBudget(3, "get", "/api/users/?expand=runs")
+        self.assertWithinBudget(3, "get", f"/api/users/{self.athletes[0].id}/")
+        self.assertWithinBudget(3, "get", f"/api/users/{self.coaches[0].id}/")
+
+    def test_runs_and_positions(self):
+        self.assertWithinBudget(1, "get", "/api/runs/")
+        self.assertWithinBudget(2, "get", f"/api/positions/?run={self.run.id}")
+        point = {"run": self.run.id, **make_points(1, start=2)[0]}
+        self.assertWithinBudget(3, "post", "/api/positions/", point, status=201)
+        batch = {"run": self.run.id, "positions": make_points(20, start=3)}
+        self.assertWithinBudget(5, "post", "/api/positions/batch/", batch, status=201)
+        self.assertWithinBudget(7, "post", f"/api/runs/{self.run.id}/stop/")
+
+    def test_cached_reports(self):
+        self.assertWithinBudget(1, "get", "/api/challenges_summary/")
+        self.assertWithinBudget(0, "get", "/api/challenges_summary/")
+        self.assertWithinBudget(1, "get", f"/api/analytics_for_coach/{self.coaches[0].id}/")
+        self.assertWithinBudget(0, "get", f"/api/analytics_for_coach/{self.coaches[0].id}/")
+
+
+class ValuesListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        Subscribe.objects.create(coach=self.coach, athlete=self.athlete)
+        CoachRate.objects.create(coach=self.coach, athlete=self.athlete, rating=4)
+        unit = UnitLocation.objects.create(
+            name="unit", uid="0000000a", latitude=55.7, longitude=37.6, picture="https://example.com/a.png", value=3
+        )
+        UnitAthleteRelation.objects.create(athlete=self.athlete, unit=unit)
+        finished, self.run = self.create_run(), self.create_run()
+        self.create_run(status="init", athlete=self.coach)
+        self.post_points(finished, make_points(3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/runs/{finished.id}/stop/")
+        # Sub-second times check that both paths format microseconds the same.
+        points = [{**point, "date_time": point["date_time"][:19] + ".123456+00:00"} for point in make_points(3)]
+        self.post_points(self.run, points)
+
+    def assertSameAsSerializer(self, viewset, path: str, query: dict | None = None) -> None:
+        response = self.client.get(path, query)
+        self.assertEqual(response.status_code, 200, response.content)
+        view = viewset()
+        view.request = Request(APIRequestFactory().get(path, query))
+        view.action = "list"
+        view.format_kwarg = None
+        view.kwargs = {}
+        queryset = view.filter_queryset(view.get_queryset())
+        expected = json.loads(JSONRenderer().render(view.get_serializer(list(queryset), many=True).data))
+        self.assertTrue(expected)
+        self.assertEqual(response.json(), expected)
+
+    def test_runs(self):
+        self.assertSameAsSerializer(RunViewSet, "/api/runs/")
+        self.assertSameAsSerializer(RunViewSet, "/api/runs/", {"status": "finished"})
+
+    def test_positions(self):
+        self.assertSameAsSerializer(PositionViewSet, "/api/positions/")
+        self.assertSameAsSerializer(PositionViewSet, "/api/positions/", {"run": self.run.id})
+
+    def test_users(self):
+        self.assertSameAsSerializer(UserReadOnlyViewSet, "/api/users/")
+        self.assertSameAsSerializer(UserReadOnlyViewSet, "/api/users/", {"expand": "runs"})
+        self.assertSameAsSerializer(UserReadOnlyViewSet, "/api/users/", {"fields": "id,items,rating,runs_finished"})
+        self.assertSameAsSerializer(UserReadOnlyViewSet, "/api/users/", {"fields": "username", "expand": "runs"})
+        self.assertSameAsSerializer(UserReadOnlyViewSet, "/api/users/", {"type": "coach", "fields": "rating"})
+
+
+class NDJSONTests(APITestCase):
+    def test_stream_matches_json_rows(self):
+        runs = [self.create_run() for _ in range(3)]
+        self.post_points(runs[0], make_points(5))
+        # A chunk smaller than the list makes the stream span several serializer calls.
+        for viewset, path, query in (
+            (RunViewSet, "/api/runs/", {}),
+            (PositionViewSet, "/api/positions/", {"run": runs[0].id}),
+        ):
+            with mock.patch.object(viewset, "stream_chunk_size", 2):
+                response = self.client.get(path, query, HTTP_ACCEPT="application/x-ndjson")
+            self.assertIsInstance(response, StreamingHttpResponse)
+            self.assertEqual(response["Content-Type"], "application/x-ndjson")
+            lines = b"".join(response.streaming_content).decode().splitlines()
+            self.assertEqual([json.loads(line) for line in lines], self.client.get(path, query).json())
+            page = self.client.get(path, {**query, "page": 1, "size": 2}).json()["results"]
+            self.assertEqual([json.loads(line) for line in lines[:2]], page)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.runs = [self.create_run(), self.create_run()]
+        for i, run in enumerate(self.runs):
+            self.post_points(run, make_points(3, start=10 * i))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/runs/{self.runs[0].id}/stop/")
+        self.runs[0].refresh_from_db()
+        # Archived runs are exported from their packed track.
+        compact_run(self.runs[0])
+
+    def export(self, name: str, file_format: str, **scope):
+        response = self.client.get(f"/api/export/{name}/", {"type": file_format, **scope})
+        self.assertEqual(response.status_code, 200, getattr(response, "content", b""))
+        return response, b"".join(response.streaming_content)
+
+    def expected_runs(self) -> list[tuple]:
+        return list(Run.objects.order_by("id").values_list(*RUN_EXPORT_COLUMNS))
+
+    def expected_positions(self) -> list[tuple]:
+        # Row-stored points come first, packed tracks follow.
+        return [
+            tuple(getattr(position, column) for column in POSITION_EXPORT_COLUMNS)
+            for run in (self.runs[1], self.runs[0])
+            for position in get_run_positions(run.id)
+        ]
+
+    def test_csv(self):
+        for name, columns, expected in (
+            ("runs", RUN_EXPORT_COLUMNS, self.expected_runs()),
+            ("positions", POSITION_EXPORT_COLUMNS, self.expected_positions()),
+        ):
+            response, content = self.export(name, "csv", athlete=self.athlete.id)
+            self.assertEqual(response["Content-Type"], "text/csv")
+            self.assertIn(f'filename="{name}_athlete_{self.athlete.id}.csv"', response["Content-Disposition"])
+            rows = list(csv.reader(io.StringIO(content.decode())))
+            self.assertEqual(rows[0], [column.replace("__", "_") for column in columns])
+            self.assertEqual(rows[1:], [[str(value) for value in row] for row in expected])
+        _, content = self.export("positions", "csv", run=self.runs[1].id)
+        self.assertEqual(len(content.decode().splitlines()), 1 + 3)
+
+    def test_xlsx(self):
+        for name, columns, expected in (
+            ("runs", RUN_EXPORT_COLUMNS, self.expected_runs()),
+            ("positions", POSITION_EXPORT_COLUMNS, self.expected_positions()),
+        ):
+            response, content = self.export(name, "xlsx", athlete=self.athlete.id)
+            self.assertEqual(response["Content-Type"], XLSX_CONTENT_TYPE)
+            sheet = openpyxl.load_workbook(io.BytesIO(content))[name]
+            rows = list(sheet.iter_rows(values_only=True))
+            self.assertEqual(rows[0], tuple(column.replace("__", "_") for column in columns))
+            expected = [
+                tuple(
+                    value.replace(tzinfo=None) if isinstance(value, datetime.datetime) else value for value in row
+                )
+                for row in expected
+            ]
+            self.assertEqual(len(rows[1:]), len(expected))
+            for row, expected_row in zip(rows[1:], expected):
+                for value, expected_value in zip(row, expected_row):
+                    if isinstance(expected_value, datetime.datetime):
+                        # Excel keeps milliseconds.
+                        self.assertLess(abs(value - expected_value), datetime.timedelta(milliseconds=1))
+                    else:
+                        self.assertEqual(value, expected_value)
+
+    def test_xlsx_splits_sheets(self):
+        with mock.patch("app_run.exporters.XLSX_MAX_ROWS", 3):
+            file = write_xlsx("rows", ["n"], [(i,) for i in range(5)])
+        workbook = openpyxl.load_workbook(file)
+        self.assertEqual(workbook.sheetnames, ["rows", "rows_2", "rows_3"])
+        self.assertEqual(
+            [[row for row, in workbook[name].iter_rows(values_only=True)] for name in workbook.sheetnames],
+            [["n", 0, 1], ["n", 2, 3], ["n", 4]],
+        )
+        self.assertEqual(openpyxl.load_workbook(write_xlsx("rows", ["n"], [])).sheetnames, ["rows"])
+
+    def test_bad_parameters(self):
+        for query in ({"athlete": self.athlete.id, "type": "pdf"}, {}, {"athlete": "x"}, {"run": 1, "athlete": 1}):
+            self.assertEqual(self.client.get("/api/export/runs/", query).status_code, 400, query)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def metrics(self) -> dict[str, float]:
+        response = self.client.get("/api/_metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_prometheus_text(self):
+        self.create_run()
+        self.client.get("/api/runs/")
+        self.client.get("/api/runs/")
+        self.client.get("/api/runs/0/")
+        samples = self.metrics()
+        labels = 'route="runs-list",method="GET"'
+        self.assertEqual(samples[f'app_run_http_requests_total{{{labels},status="200"}}'], 2)
+        self.assertEqual(samples['app_run_http_requests_total{route="runs-detail",method="GET",status="404"}'], 1)
+        for name in ("duration_seconds", "db_seconds", "serializer_seconds"):
+            buckets = [
+                value for key, value in samples.items() if key.startswith(f"app_run_http_request_{name}_bucket{{{labels}")
+            ]
+            self.assertEqual(buckets, sorted(buckets), name)
+            self.assertEqual(buckets[-1], 2, name)
+            self.assertEqual(samples[f"app_run_http_request_{name}_count{{{labels}}}"], 2, name)
+        self.assertEqual(samples[f'app_run_http_response_size_bytes_bucket{{{labels},le="+Inf"}}'], 2)
+        self.assertGreater(samples[f"app_run_http_request_serializer_seconds_sum{{{labels}}}"], 0)
+        # Scrapes don't count themselves.
+        self.assertFalse(any('route="metrics"' in key for key in self.metrics()))
+
+    def test_serializer_timing(self):
+        run = self.create_run()
+        self.assertTrue(hasattr(BaseSerializer.data.fget, "__wrapped__"))
+        with serializer_timer() as timer:
+            data = RunSerializer([run, run], many=True).data
+        self.assertEqual(len(data), 2)
+        self.assertGreater(timer[0], 0)
+        self.assertEqual(timer[1], 0)
+        # Without a timer (outside a request) serializers work as usual.
+        self.assertEqual(RunSerializer(run).data["id"], run.id)
+
+    def test_access(self):
+        with override_settings(DEBUG=False, INTERNAL_IPS=[]):
+            self.assertEqual(self.client.get("/api/_metrics/").status_code, 404)
+        with override_settings(DEBUG=False, INTERNAL_IPS=["10.0.0.1"]):
+            self.assertEqual(self.client.get("/api/_metrics/", REMOTE_ADDR="10.0.0.1").status_code, 200)
+            self.assertEqual(self.client.get("/api/_metrics/", REMOTE_ADDR="10.0.0.2").status_code, 404)
+        with override_settings(DEBUG=True, INTERNAL_IPS=[]):
+            self.assertEqual(self.client.get("/api/_metrics/").status_code, 200)
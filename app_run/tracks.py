@@ -0,0 +1,147 @@
+import datetime
+import struct
+
+import numpy as np
+from django.db import transaction
+
+from .models import Position, Run, RunTrack
+
+# Header: magic, format version, reserved, points count, reserved, first position id, base time (us since epoch).
+# Followed by seven little-endian int32 arrays of points count items each: id deltas, latitude deltas,
+# longitude deltas (1e-7 degree), time offsets (ms), speed (cm/s), distance (10 m), time remainders (us).
+# Version 1 tracks have no remainders and read back with millisecond times.
+TRACK_MAGIC = b"TRK1"
+TRACK_VERSION = 2
+TRACK_HEADER = struct.Struct("<4sHHIIqq")
+TRACK_ARRAYS = (
+    "id_deltas",
+    "latitude_deltas",
+    "longitude_deltas",
+    "time_offsets",
+    "speeds",
+    "distances",
+    "time_remainders",
+)
+TRACK_VERSION_ARRAYS = {1: TRACK_ARRAYS[:6], 2: TRACK_ARRAYS}
+COORDINATE_SCALE = 10_000_000
+SPEED_SCALE = 100
+DISTANCE_SCALE = 100
+INT32 = np.dtype("<i4")
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _to_int32(values: np.ndarray, name: str) -> np.ndarray:
+    info = np.iinfo(INT32)
+    if values.size and (values.min() < info.min or values.max() > info.max):
+        raise ValueError(f"Track {name} does not fit into int32")
+    return values.astype(INT32)
+
+
+def _deltas(values: np.ndarray) -> np.ndarray:
+    # Wrapping int32 deltas: cumsum in int32 wraps back to the exact value, e.g. across the antimeridian.
+    values = values.astype(np.int64)
+    deltas = np.diff(values, prepend=np.int64(0))
+    return ((deltas + 2 ** 31) % 2 ** 32 - 2 ** 31).astype(INT32)
+
+
+def pack_track(rows) -> bytes:
+    rows = list(rows)
+    if not rows:
+        raise ValueError("Track is empty")
+    ids = np.array([row["id"] for row in rows], dtype=np.int64)
+    times_us = np.array(
+        [(row["date_time"] - EPOCH) // datetime.timedelta(microseconds=1) for row in rows], dtype=np.int64
+    )
+    base_time_us = int(times_us.min())
+    # Split so that the int32 offsets still cover weeks, times come back exact to the microsecond.
+    time_offsets_ms, time_remainders = np.divmod(times_us - base_time_us, 1000)
+    arrays = [
+        _to_int32(ids - ids[0], "ids"),
+        _deltas(np.round(np.array([row["latitude"] for row in rows]) * COORDINATE_SCALE)),
+        _deltas(np.round(np.array([row["longitude"] for row in rows]) * COORDINATE_SCALE)),
+        _to_int32(time_offsets_ms, "time offsets"),
+        _to_int32(np.round(np.array([row["speed"] for row in rows]) * SPEED_SCALE), "speeds"),
+        _to_int32(np.round(np.array([row["distance"] for row in rows]) * DISTANCE_SCALE), "distances"),
+        time_remainders.astype(INT32),
+    ]
+    header = TRACK_HEADER.pack(TRACK_MAGIC, TRACK_VERSION, 0, len(rows), 0, int(ids[0]), base_time_us)
+    return header + b"".join(array.tobytes() for array in arrays)
+
+
+class PackedTrack:
+    def __init__(self, data: bytes | memoryview):
+        self.buffer = memoryview(data)
+        magic, version, _, count, _, first_id, base_time_us = TRACK_HEADER.unpack_from(self.buffer)
+        if magic != TRACK_MAGIC or version not in TRACK_VERSION_ARRAYS:
+            raise ValueError("Unknown track format")
+        self.count = count
+        self.first_id = first_id
+        self.base_time = EPOCH + datetime.timedelta(microseconds=base_time_us)
+        self.time_remainders = np.zeros(count, dtype=INT32)
+        for i, name in enumerate(TRACK_VERSION_ARRAYS[version]):
+            offset = TRACK_HEADER.size + i * count * INT32.itemsize
+            setattr(self, name, np.frombuffer(self.buffer, dtype=INT32, count=count, offset=offset))
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.first_id + self.id_deltas.astype(np.int64)
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        return np.cumsum(self.latitude_deltas, dtype=INT32) / COORDINATE_SCALE
+
+    @property
+    def longitudes(self) -> np.ndarray:
+        return np.cumsum(self.longitude_deltas, dtype=INT32) / COORDINATE_SCALE
+
+    def positions(self, run_id: int) -> list[Position]:
+        times = [
+            self.base_time + datetime.timedelta(milliseconds=offset, microseconds=remainder)
+            for offset, remainder in zip(self.time_offsets.tolist(), self.time_remainders.tolist())
+        ]
+        return [
+            Position(
+                id=position_id,
+                run_id=run_id,
+                latitude=latitude,
+                longitude=longitude,
+                date_time=date_time,
+                speed=speed / SPEED_SCALE,
+                distance=distance / DISTANCE_SCALE,
+            )
+            for position_id, latitude, longitude, date_time, speed, distance in zip(
+                self.ids.tolist(),
+                self.latitudes.tolist(),
+                self.longitudes.tolist(),
+                times,
+                self.speeds.tolist(),
+                self.distances.tolist(),
+            )
+        ]
+
+
+def get_packed_track(run_id: int) -> PackedTrack | None:
+    data = RunTrack.objects.filter(run_id=run_id).values_list("data", flat=True).first()
+    if data is None:
+        return None
+    return PackedTrack(data)
+
+
+def get_run_positions(run_id: int) -> list[Position]:
+    track = get_packed_track(run_id)
+    if track is not None:
+        return track.positions(run_id)
+    return list(Position.objects.filter(run_id=run_id).order_by("id"))
+
+
+def compact_run(run: Run) -> RunTrack | None:
+    if run.status != "finished":
+        raise ValueError("Only finished runs can be compacted")
+    with transaction.atomic():
+        positions = Position.objects.select_for_update().filter(run=run).order_by("id")
+        rows = list(positions.values("id", "latitude", "longitude", "date_time", "speed", "distance"))
+        if not rows:
+            return None
+        track = RunTrack.objects.create(run=run, points_count=len(rows), data=pack_track(rows))
+        positions.delete()
+    return track
@@ -0,0 +1,128 @@
+import datetime
+import io
+import re
+
+import openpyxl
+
+from .models import UnitLocation, UploadJob
+from .spatial import invalidate_unit_locations
+
+
+class UnitLocationUploader:
+    chunk_size = 1000
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.rows_processed = 0
+        self.wrong_rows: list[tuple[int, list]] = []
+
+    def upsert_units(self, file) -> list[tuple[int, list]]:
+        units = {}
+        workbook = openpyxl.load_workbook(file, read_only=True)
+        try:
+            for row_number, row in enumerate(workbook.active.iter_rows(min_row=2, values_only=True), start=2):
+                self.rows_processed += 1
+                unit = self.get_unit(row)
+                if unit is None:
+                    self.wrong_rows.append((row_number, list(row)))
+                    continue
+                units[unit.uid] = unit
+                if len(units) >= self.chunk_size:
+                    self.save_units(list(units.values()))
+                    units = {}
+            self.save_units(list(units.values()))
+        finally:
+            workbook.close()
+            invalidate_unit_locations()
+        return self.wrong_rows
+
+    def save_units(self, units: list[UnitLocation]) -> None:
+        if units:
+            UnitLocation.objects.bulk_create(
+                units,
+                update_conflicts=True,
+                unique_fields=["uid"],
+                update_fields=["name", "latitude", "longitude", "picture", "value"],
+            )
+        if self.on_progress:
+            self.on_progress(self.rows_processed, len(self.wrong_rows))
+
+    def check_position(self, lat, lon) -> bool:
+        try:
+            lat = float(lat)
+            lon = float(lon)
+            return (-90.0 <= lat <= 90.0) and (-180.0 <= lon <= 180.0)
+        except Exception:
+            return False
+
+    def check_level(self, level):
+        try:
+            return 0 <= int(level) <= 32767
+        except Exception:
+            return False
+
+    def check_name(self, name):
+        if not name or not isinstance(name, str) or len(name) > 50:
+            return False
+        return True
+
+    def check_uid(self, uid):
+        return uid is not None and 0 < len(str(uid)) <= 8
+
+    def get_unit(self, row) -> UnitLocation | None:
+        row = (*row, *[None] * (6 - len(row)))
+        if not self.check_url(row[5]) or not self.check_position(row[3], row[4]) or not self.check_level(row[2]) or not self.check_name(row[0]) or not self.check_uid(row[1]):
+            return None
+        return UnitLocation(
+            name=row[0],
+            uid=str(row[1]),
+            latitude=float(row[3]),
+            longitude=float(row[4]),
+            picture=row[5],
+            value=int(row[2])
+        )
+
+    @staticmethod
+    def check_url(url: str) -> bool:
+        if not isinstance(url, str):
+            return False
+        pattern = r"^(https?):\/\/([a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}(\/[^\s]*)?$"
+        if re.match(pattern, url):
+            return True
+        return False
+
+
+def rejected_rows(wrong_rows: list[tuple[int, list]]) -> list[dict]:
+    return [{"row": row_number, "values": values} for row_number, values in wrong_rows]
+
+
+def claim_upload_job() -> UploadJob | None:
+    # Conditional UPDATE works as a claim on every backend, two workers never get the same job.
+    for job_id in UploadJob.objects.filter(status="queued").order_by("id").values_list("id", flat=True)[:10]:
+        claimed = UploadJob.objects.filter(pk=job_id, status="queued").update(
+            status="running", started_at=datetime.datetime.now(datetime.timezone.utc)
+        )
+        if claimed:
+            return UploadJob.objects.get(pk=job_id)
+    return None
+
+
+def process_upload_job(job: UploadJob) -> UploadJob:
+    def on_progress(rows_processed, rows_rejected):
+        UploadJob.objects.filter(pk=job.pk).update(rows_processed=rows_processed, rows_rejected=rows_rejected)
+
+    uploader = UnitLocationUploader(on_progress=on_progress)
+    try:
+        wrong_rows = uploader.upsert_units(io.BytesIO(job.file_data))
+    except Exception as error:
+        job.status = "failed"
+        job.error = str(error) or error.__class__.__name__
+    else:
+        job.status = "finished"
+        job.rejected_rows = rejected_rows(wrong_rows)
+    job.rows_processed = uploader.rows_processed
+    job.rows_rejected = len(uploader.wrong_rows)
+    job.file_data = b""
+    job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+    job.save()
+    return job
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "app_run:version:{name}"
+USERS_VERSION = "users"
+
+
+def get_version_timeout() -> int:
+    # Bounded so that a process with its own cache picks up changes made elsewhere after at most this long.
+    return getattr(settings, "CACHE_VERSION_TIMEOUT", 60)
+
+
+def get_version(name: str) -> int:
+    version = cache.get(VERSION_KEY.format(name=name))
+    if version is None:
+        version = bump_version(name)
+    return version
+
+
+def get_versions(names) -> list[int]:
+    return get_or_create_versions(names)[0]
+
+
+def get_or_create_versions(names) -> tuple[list[int], list[str]]:
+    keys = [VERSION_KEY.format(name=name) for name in names]
+    found = cache.get_many(keys)
+    created = [name for key, name in zip(keys, names) if key not in found]
+    versions = [found[key] if key in found else bump_version(name) for key, name in zip(keys, names)]
+    return versions, created
+
+
+def bump_version(name: str) -> int:
+    # Timestamp instead of a counter, so an expired or evicted key never yields an old version again.
+    version = time.time_ns()
+    cache.set(VERSION_KEY.format(name=name), version, get_version_timeout())
+    return version
+
+
+def forget_versions(names) -> None:
+    # Safe at any time: a missing stamp is recreated newer than any version handed out before.
+    cache.delete_many([VERSION_KEY.format(name=name) for name in names])
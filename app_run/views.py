@@ -1,12 +1,21 @@
-from django.db.models import Count, Q, Sum, Avg, Prefetch
-from django.http import JsonResponse
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import Avg, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from rest_framework import status
-from rest_framework.decorators import api_view
-from rest_framework.generics import get_object_or_404, CreateAPIView, ListAPIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404, CreateAPIView, ListAPIView, RetrieveAPIView
 from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from app_run.models import (
@@ -17,31 +26,69 @@ from app_run.models import (
     UnitLocation,
     UnitAthleteRelation,
     AthleteInfo,
-    CoachRate
+    CoachRate,
+    UploadJob,
 )
 from app_run.serializers import (
     RunSerializer,
     UserSerializer,
     PositionSerializer,
+    PositionBatchSerializer,
     SubscribeSerializer,
     CoachSerializer,
     AthleteSerializer,
     ChallengeSerializer,
-    ChallengesSummaryListSerializer,
     UploadFileSerializer,
+    RunImportSerializer,
     UnitLocationSerializer,
     AthleteInfoSerializer,
     CoachRateSerializer,
+    UploadJobSerializer,
+    CoachAnalyticsParamsSerializer,
+    LeaderboardParamsSerializer,
 )
 from django.contrib.auth.models import User
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .services import get_distance, get_run_time_seconds, get_average_speed
+from .analytics import get_coach_analytics
+from .leaderboards import get_leaderboard
+from .services import (
+    get_run_totals,
+    get_last_position,
+    clear_last_position,
+    finish_run,
+    recompute_run_aggregates,
+    RUN_VERSION,
+)
+from .challenges import get_challenges_summary, CHALLENGES_VERSION
+from .conditional import versioned_response
+from .fast_serializers import RunValuesSerializer, UserValuesSerializer, PositionValuesSerializer
+from .exporters import (
+    EXPORT_FORMATS,
+    XLSX_CONTENT_TYPE,
+    RUN_EXPORT_COLUMNS,
+    POSITION_EXPORT_COLUMNS,
+    get_export_runs,
+    iter_run_rows,
+    iter_position_rows,
+    stream_csv,
+    write_xlsx,
+)
+from .importers import import_run
+from .metrics import registry
+from .pagination import CustomPagination, HybridPagination, PositionHybridPagination, IdOrderedList
+from .renderers import NDJSONRenderer
+from .simplify import simplify_track
+from .spatial import UNIT_LOCATIONS_VERSION
+from .tracks import get_packed_track, get_run_positions
+from .uploads import UnitLocationUploader, rejected_rows
+from .versions import USERS_VERSION
 from django_filters.rest_framework import DjangoFilterBackend
-import openpyxl
-import re
+
+CLUB_DATA_VERSION = "club_data"
 
 
 @api_view(["GET"])
+@versioned_response(lambda: [CLUB_DATA_VERSION], public=True, max_age=60 * 60 * 24)
 def get_club_data(request):
     return Response({
         "company_name": "Der run club",
@@ -50,48 +97,140 @@ def get_club_data(request):
     })
 
 
-class CustomPagination(PageNumberPagination):
-    page_size_query_param = 'size'
+def metrics_view(request):
+    if not settings.DEBUG and request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class NDJSONStreamMixin:
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != NDJSONRenderer.format:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_rows(queryset), content_type=NDJSONRenderer.media_type)
+
+    def stream_rows(self, queryset):
+        renderer = NDJSONRenderer()
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while chunk := list(islice(rows, self.stream_chunk_size)):
+            yield renderer.render(self.get_serializer(chunk, many=True).data)
+
+
+class ValuesListMixin:
+    values_serializer_class = None
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        queryset = serializer.prepare(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
 
-class RunViewSet(ModelViewSet):
+
+class RunViewSet(NDJSONStreamMixin, ValuesListMixin, ModelViewSet):
     queryset = Run.objects.select_related("athlete").order_by("-id")
     serializer_class = RunSerializer
+    values_serializer_class = RunValuesSerializer
     filter_backends = [
         DjangoFilterBackend,
         OrderingFilter,
     ]
     filterset_fields = ["status", "id", "athlete"]
     ordering_fields = ["created_at"]
-    pagination_class = CustomPagination
+    pagination_class = HybridPagination
 
+    @method_decorator(versioned_response(lambda pk: [RUN_VERSION.format(run_id=pk), USERS_VERSION], no_cache=True))
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.data["status"] == "finished":
+            patch_cache_control(response, public=True, max_age=60 * 60)
+        return response
 
-class UserReadOnlyViewSet(ReadOnlyModelViewSet):
+
+class UserReadOnlyViewSet(ValuesListMixin, ReadOnlyModelViewSet):
     serializer_class = UserSerializer
+    values_serializer_class = UserValuesSerializer
     filter_backends = [SearchFilter]
     search_fields = ["first_name", "last_name"]
     pagination_class = CustomPagination
+    model_fields = {"id", "username", "last_name", "first_name", "date_joined"}
+
+    def get_query_list(self, param: str, allowed) -> set[str] | None:
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = names - set(allowed)
+        if unknown:
+            raise ValidationError({param: f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return names
+
+    def get_requested_fields(self) -> set[str] | None:
+        if not hasattr(self, "_requested_fields"):
+            # Retrieve picks its serializer by user type, get_serializer narrows the check once the user is known.
+            serializers = [CoachSerializer, AthleteSerializer] if self.action == "retrieve" else [self.serializer_class]
+            self._requested_fields = self.get_query_list(
+                "fields", {name for serializer in serializers for name in serializer.Meta.fields}
+            )
+        return self._requested_fields
+
+    def get_expand(self) -> set[str]:
+        return self.get_query_list("expand", UserSerializer.Meta.expandable_fields) or set()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.get_requested_fields()
+        context["expand"] = self.get_expand()
+        return context
 
     def get_queryset(self):
-        qs = (
-            User.objects.filter(is_superuser=False)
-            .prefetch_related("user_run")
-            .prefetch_related(
+        fields = self.get_requested_fields()
+        expand = self.get_expand()
+
+        def wanted(name: str) -> bool:
+            return fields is None or name in fields
+
+        qs = User.objects.filter(is_superuser=False)
+        if fields is not None:
+            # is_staff picks the type and the retrieve serializer.
+            qs = qs.only("id", "is_staff", *(fields & self.model_fields))
+        if wanted("items"):
+            qs = qs.prefetch_related(
                 Prefetch(
                     "uathlete",
                     queryset=UnitAthleteRelation.objects.select_related("unit")
                 )
             )
-            .annotate(runs_finished=Count("user_run", filter=Q(user_run__status="finished")))
-            .annotate(avg_rating=Avg("coach__rating"))
-        )
+        if "runs" in expand:
+            qs = qs.prefetch_related(Prefetch("user_run", queryset=Run.objects.order_by("id")))
+        if wanted("runs_finished"):
+            qs = qs.annotate(runs_finished=Coalesce("athlete_stats__finished_runs", 0))
+        if wanted("rating"):
+            coach_ratings = (
+                CoachRate.objects
+                .filter(coach=OuterRef("pk"))
+                .values("coach")
+                .annotate(avg=Avg("rating"))
+                .values("avg")
+            )
+            qs = qs.annotate(avg_rating=Subquery(coach_ratings))
+        if self.action == "retrieve":
+            if wanted("coach"):
+                qs = qs.select_related("athlete_subscribe")
+            if wanted("athletes"):
+                qs = qs.prefetch_related("coach_subscribe")
         type_filter = self.request.query_params.get("type")
         if type_filter:
             match type_filter:
                 case "coach":
-                    qs = qs.filter(is_staff=True).prefetch_related("coach_subscribe", "coach")
+                    qs = qs.filter(is_staff=True)
                 case "athlete":
-                    qs = qs.filter(is_staff=False).select_related("athlete_subscribe", "athlete")
+                    qs = qs.filter(is_staff=False)
         return qs
 
     def get_serializer_class(self, is_coach: bool):
@@ -111,6 +250,7 @@ class UserReadOnlyViewSet(ReadOnlyModelViewSet):
         else:
             is_coach = args[0].is_staff
             serializer_class = self.get_serializer_class(is_coach)
+            self.get_query_list("fields", serializer_class.Meta.fields)
         kwargs.setdefault('context', self.get_serializer_context())
         return serializer_class(*args, **kwargs)
 
@@ -124,7 +264,7 @@ class RunStartView(APIView):
         if run.status != "init":
             return Response({"Detail": "Wrong run status"}, 400)
         run.status = "in_progress"
-        run.save()
+        run.save(update_fields=["status", "created_at"])
         return Response({"Detail": "Run started"}, 200)
 
 
@@ -134,54 +274,45 @@ class RunStopView(APIView):
     def post(self, request, *args, **kwargs):
         run_id = kwargs.get("run_id")
         run = get_object_or_404(Run, pk=run_id)
-        if run.status != "in_progress":
+        if run.status != "in_progress" or not finish_run(run):
             return Response({"Detail": "Wrong run status"}, 400)
-
-        positions = self.get_positions(run)
-        dist_total = get_distance(positions)
-        run_time_seconds = get_run_time_seconds(positions)
-        avg_speed = get_average_speed(positions)
-        self.update_run_fields(run, dist_total, run_time_seconds, avg_speed)
-        self.check_run_count(run.athlete)
-        self.check_total_distance(run.athlete)
-        self.check_run_speed(run)
         return Response({"Detail": "Run stopped"}, 200)
 
-    def check_run_speed(self, run):
-        if run.run_time_seconds < 610 and run.distance >= 2.0:
-            Challenge.objects.get_or_create(full_name="Пробеги 2 километра меньше чем за 10 минут!", athlete=run.athlete)
 
-    def check_total_distance(self, athlete):
-        total_distance = (
-            Run.objects
-            .filter(athlete=athlete, status="finished")
-            .aggregate(total_distance=Sum("distance"))
-            .get("total_distance")
+class RunImportView(APIView):
+    parser_classes = [MultiPartParser]
+    serializer_class = RunImportSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            run, stats = import_run(data["athlete"], data["file"], data["format"], data["comment"])
+        except ValueError as error:
+            return Response({"Detail": str(error)}, 400)
+        return Response(
+            {**RunSerializer(run).data, "positions_count": stats.points, "skipped_points": stats.skipped},
+            status=status.HTTP_201_CREATED,
         )
-        if total_distance > 50.0:
-            Challenge.objects.get_or_create(full_name="Пробеги 50 километров!", athlete=athlete)
 
-    def get_positions(self, run):
-        return Position.objects.filter(run=run)
 
-    def update_run_fields(self, run: Run, dist_total: float, run_time_seconds: int, avg_speed: float) -> None:
-        run.distance = dist_total
-        run.status = "finished"
-        run.run_time_seconds = run_time_seconds
-        run.speed = avg_speed
-        run.save(update_fields=["distance", "status", "run_time_seconds", "speed"])
+class RunStatsView(APIView):
+    serializer_class = None
 
-    @staticmethod
-    def check_run_count(athlete):
-        finished_run_count = Run.objects.filter(athlete=athlete, status="finished").count()
-        if finished_run_count == 10:
-            Challenge.objects.get_or_create(full_name="Сделай 10 Забегов!", athlete=athlete)
+    def get(self, request, *args, **kwargs):
+        run = get_object_or_404(Run, pk=kwargs.get("run_id"))
+        return Response({"id": run.id, "status": run.status, **get_run_totals(run)}, 200)
 
 
-class PositionViewSet(ModelViewSet):
-    queryset = Position.objects.select_related("run")
+class PositionViewSet(NDJSONStreamMixin, ValuesListMixin, ModelViewSet):
+    queryset = Position.objects.select_related("run").order_by("id")
     serializer_class = PositionSerializer
+    values_serializer_class = PositionValuesSerializer
     lookup_url_kwarg = "run"
+    pagination_class = PositionHybridPagination
+    simplified_cache_key = "app_run:run:{run_id}:simplified:{tolerance}:{max_points}"
+    simplified_cache_timeout = 60 * 60 * 24
 
     def filter_queryset(self, queryset):
         run_id = self.request.query_params.get(self.lookup_url_kwarg)
@@ -189,15 +320,84 @@ class PositionViewSet(ModelViewSet):
             return queryset.filter(run=run_id)
         return queryset
 
-    def get_serializer_context(self):
-        run_id = self.request.data.get("run")
-        prev_position = self.get_prev_position(run_id)
-        context = super().get_serializer_context()
-        context |= {"prev_position": prev_position}
-        return context
+    def list(self, request, *args, **kwargs):
+        run_id = request.query_params.get(self.lookup_url_kwarg)
+        simplify_params = self.get_simplify_params()
+        if run_id and simplify_params:
+            return Response(self.get_simplified_data(int(run_id), **simplify_params))
+        if run_id:
+            track = get_packed_track(run_id)
+            if track is not None:
+                # Packed positions keep their ids, so cursors stay valid across compaction.
+                positions = IdOrderedList(track.positions(int(run_id)))
+                page = self.paginate_queryset(positions)
+                if page is not None:
+                    return self.get_paginated_response(self.get_serializer(page, many=True).data)
+                return Response(self.get_serializer(positions.items, many=True).data)
+        return super().list(request, *args, **kwargs)
+
+    def get_simplify_params(self) -> dict[str, float | int | None]:
+        tolerance = self.request.query_params.get("tolerance")
+        max_points = self.request.query_params.get("max_points")
+        if tolerance is None and max_points is None:
+            return {}
+        try:
+            tolerance = float(tolerance) if tolerance is not None else None
+            max_points = int(max_points) if max_points is not None else None
+        except ValueError:
+            raise ValidationError("tolerance must be a number and max_points an integer")
+        if (tolerance is not None and tolerance < 0) or (max_points is not None and max_points < 2):
+            raise ValidationError("tolerance must be >= 0 and max_points >= 2")
+        return {"tolerance": tolerance, "max_points": max_points}
+
+    def get_simplified_data(self, run_id: int, tolerance: float | None, max_points: int | None):
+        cache_key = self.simplified_cache_key.format(run_id=run_id, tolerance=tolerance, max_points=max_points)
+        finished = Run.objects.filter(pk=run_id, status="finished").exists()
+        if finished:
+            data = cache.get(cache_key)
+            if data is not None:
+                return data
+        positions = get_run_positions(run_id)
+        indexes = simplify_track(
+            [position.latitude for position in positions],
+            [position.longitude for position in positions],
+            tolerance=tolerance,
+            max_points=max_points,
+        )
+        data = list(self.get_serializer([positions[i] for i in indexes], many=True).data)
+        if finished:
+            cache.set(cache_key, data, self.simplified_cache_timeout)
+        return data
+
+    def perform_create(self, serializer):
+        serializer.context["prev_position"] = self.get_prev_position(serializer.validated_data["run"])
+        serializer.save()
 
-    def get_prev_position(self, run_id: int) -> Position | None:
-        return Position.objects.filter(run_id=run_id).order_by("-id").first()
+    def perform_update(self, serializer):
+        run_id = serializer.instance.run_id
+        with transaction.atomic():
+            serializer.save()
+            for changed_run_id in {run_id, serializer.instance.run_id}:
+                recompute_run_aggregates(changed_run_id)
+        for changed_run_id in {run_id, serializer.instance.run_id}:
+            clear_last_position(changed_run_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            recompute_run_aggregates(instance.run_id)
+        clear_last_position(instance.run_id)
+
+    def get_prev_position(self, run: Run) -> Position | None:
+        return get_last_position(run)
+
+    @action(detail=False, methods=["post"], url_path="batch", serializer_class=PositionBatchSerializer)
+    def batch(self, request, *args, **kwargs):
+        serializer = PositionBatchSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        positions = serializer.instance
+        return Response(PositionSerializer(positions, many=True).data, status=status.HTTP_201_CREATED)
 
 
 class SubscribeView(CreateAPIView):
@@ -226,65 +426,35 @@ class ChallengeListView(ListAPIView):
     filterset_fields = ["athlete"]
 
 
-class ChallengesSummaryListView(ListAPIView):
-    serializer_class = ChallengesSummaryListSerializer
-
-    def get_queryset(self):
-        queryset = Challenge.objects.values("full_name").distinct()
-        res = []
-        for obj in queryset:
-            obj["athletes"] = User.objects.filter(user_challenge__full_name=obj.get("full_name"))
-            res.append(obj)
-        return queryset
-
-
 class ChallengesSummary2(APIView):
 
+    @method_decorator(versioned_response(lambda: [CHALLENGES_VERSION, USERS_VERSION], public=True, max_age=60))
     def get(self, request, *args, **kwargs):
-        challenge_names = Challenge.objects.values_list("full_name", flat=True).distinct()
-        data_map = {name: set() for name in challenge_names}
-        users = User.objects.prefetch_related("user_challenge").filter(is_staff=False)
-        for user in users:
-            for ch in user.user_challenge.all():
-                if ch.full_name in data_map:
-                    data_map[ch.full_name].add(user)
-
-        data = [{"name_to_display": key, "athletes": [
-            {"id": user.id, "full_name": f"{user.first_name} {user.last_name}", "username": user.username} for user in value
-        ]} for key, value in data_map.items()]
-
-        return Response(data=data, status=200)
+        return Response(data=get_challenges_summary(), status=200)
 
 
 class CoachAnalytics(APIView):
+    serializer_class = CoachAnalyticsParamsSerializer
+
     def get(self, request, coach_id, *args, **kwargs):
-        athletes = list(Subscribe.objects.filter(coach_id=coach_id).values_list("athlete_id", flat=True))
-        if not athletes:
-            return Response({}, status=404)
-        data = dict()
-        longest_run = Run.objects.filter(athlete__in=athletes).order_by("-distance").first()
-        if not longest_run:
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = get_coach_analytics(coach_id, **serializer.validated_data)
+        if not data:
             return Response({}, status=404)
-        data["longest_run_user"] = longest_run.athlete_id
-        data["longest_run_value"] = longest_run.distance
-
-        users = (
-            User.objects
-            .filter(pk__in=athletes)
-            .prefetch_related("user_run")
-            .annotate(total_dist=Sum("user_run__distance"))
-            .annotate(avg_speed=Avg("user_run__speed", default=0))
-        )
+        return JsonResponse(data, status=200)
 
-        longest_total_distance = users.order_by("-total_dist").first()
-        data["total_run_user"] = longest_total_distance.id
-        data["total_run_value"] = longest_total_distance.total_dist
 
-        avg_speed = users.order_by("-avg_speed").first()
-        data["speed_avg_user"] = avg_speed.id
-        data["speed_avg_value"] = avg_speed.avg_speed
+class LeaderboardView(APIView):
+    serializer_class = LeaderboardParamsSerializer
 
-        return JsonResponse(data, status=200)
+    def get(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if "athlete_id" not in params and request.user.is_authenticated:
+            params["athlete_id"] = request.user.id
+        return Response(get_leaderboard(**params), 200)
 
 
 class UploadFileView(APIView):
@@ -298,71 +468,72 @@ class UploadFileView(APIView):
             validated_data = serializer.validated_data
             file = validated_data["file"]
             content_type = validated_data["file"].content_type
-            if content_type != "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
+            if content_type != XLSX_CONTENT_TYPE:
                 return Response("Wrong content type", 400)
 
+            if request.query_params.get("async") in ("1", "true"):
+                job = UploadJob.objects.create(file_name=file.name, file_data=file.read())
+                return Response(UploadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
             wrong_rows = self.get_rows(file)
         return Response(wrong_rows, status=status.HTTP_200_OK)
 
     def get_rows(self, file):
-        wrong_rows = []
-        sheet = openpyxl.load_workbook(file)
-        sheet = sheet.active
-        for i, row in enumerate(sheet.iter_rows(values_only=True)):
-            if i == 0:
-                continue
-            wrong_row = self.get_unit(row)
-            if wrong_row:
-                wrong_rows.append(list(wrong_row))
-        return wrong_rows
-
-    def check_position(self, lat, lon) -> bool:
-        try:
-            lat = float(lat)
-            lon = float(lon)
-            return (-90.0 <= lat <= 90.0) and (-180.0 <= lon <= 180.0)
-        except Exception:
-            return False
+        return rejected_rows(UnitLocationUploader().upsert_units(file))
 
-    def check_level(self, level):
-        try:
-            int(level)
-            return True
-        except Exception:
-            return False
 
-    def check_name(self, name):
-        if not name or not isinstance(name, str):
-            return False
-        return True
+class UploadJobView(RetrieveAPIView):
+    queryset = UploadJob.objects.all()
+    serializer_class = UploadJobSerializer
 
-    def get_unit(self, row):
-        try:
-            if not self.check_url(row[5]) or not self.check_position(row[3], row[4]) or not self.check_level(row[2]) or not self.check_name(row[0]):
-                raise ValueError
-            UnitLocation.objects.create(
-                name=row[0],
-                uid=row[1],
-                latitude=row[3],
-                longitude=row[4],
-                picture=row[5],
-                value=row[2]
-            )
-        except ValueError:
-            return row
 
-    @staticmethod
-    def check_url(url: str) -> bool:
-        pattern = r"^(https?):\/\/([a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}(\/[^\s]*)?$"
-        if re.match(pattern, url):
-            return True
-        return False
+class RunExportView(APIView):
+    export_name = "runs"
+    columns = RUN_EXPORT_COLUMNS
+    scope_params = ("run", "athlete", "coach")
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get("type", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response({"Detail": f"type must be one of {', '.join(EXPORT_FORMATS)}"}, 400)
+        scope = {
+            param: request.query_params[param]
+            for param in self.scope_params
+            if request.query_params.get(param)
+        }
+        if len(scope) != 1 or not all(value.isdigit() for value in scope.values()):
+            return Response({"Detail": "Exactly one of run, athlete or coach id is required"}, 400)
+        [(scope_name, scope_id)] = scope.items()
+        runs = get_export_runs(**{f"{scope_name}_id": int(scope_id)})
+        header = [column.replace("__", "_") for column in self.columns]
+        rows = self.get_rows(runs)
+        file_name = f"{self.export_name}_{scope_name}_{scope_id}.{file_format}"
+        if file_format == "xlsx":
+            file = write_xlsx(self.export_name, header, rows)
+            return FileResponse(file, as_attachment=True, filename=file_name, content_type=XLSX_CONTENT_TYPE)
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        return response
+
+    def get_rows(self, runs):
+        return iter_run_rows(runs)
+
+
+class PositionExportView(RunExportView):
+    export_name = "positions"
+    columns = POSITION_EXPORT_COLUMNS
+
+    def get_rows(self, runs):
+        return iter_position_rows(runs)
 
 
 class UnitLocationListView(ListAPIView):
     queryset = UnitLocation.objects.all()
     serializer_class = UnitLocationSerializer
 
+    @method_decorator(versioned_response(lambda: [UNIT_LOCATIONS_VERSION], public=True, max_age=60))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class AthleteInfoView(ModelViewSet):
     queryset = AthleteInfo.objects.all()
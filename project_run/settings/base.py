@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_run.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app_run.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'project_run.urls'
@@ -112,11 +114,45 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = 'static'
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The cache holds the last position of each run and version stamps. With several worker
+# processes it should be shared between them (file, redis, memcached): a per-process cache
+# still gives correct positions, but serves stale data for up to CACHE_VERSION_TIMEOUT.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'project-run',
+    }
+}
+
+# Lifetime in seconds of the cache version stamps behind ETags and cached payloads. With a per-process
+# cache this is how long a process can serve data another process has already changed.
+CACHE_VERSION_TIMEOUT = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Distance backend used by app_run.distance: "geodesic", "haversine" or "vincenty"
+DISTANCE_BACKEND = 'vincenty'
+
+# Max age in seconds of the in-process UnitLocation spatial index before it is rebuilt
+UNIT_LOCATION_INDEX_TTL = 300
+
+# Clients allowed to read /api/_metrics/ when DEBUG is off
+INTERNAL_IPS = ['127.0.0.1']
+
+# Per-request query limits checked by app_run.middleware.QueryBudgetMiddleware, see app_run.querycount
+QUERY_BUDGET = {
+    'MAX_QUERIES': 50,
+    'MAX_DUPLICATES': 5,
+    'RAISE': False,
+    'VIEWS': {},
+}
+
 # REST_FRAMEWORK = {
 #     'DEFAULT_AUTHENTICATION_CLASSES': [
 #         'rest_framework.authentication.BasicAuthentication',
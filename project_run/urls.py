@@ -25,15 +25,22 @@ from app_run.views import (
     UserReadOnlyViewSet,
     RunStartView,
     RunStopView,
+    RunStatsView,
+    RunImportView,
     PositionViewSet,
     SubscribeView,
     ChallengeListView,
     ChallengesSummary2,
     CoachAnalytics,
+    LeaderboardView,
     UploadFileView,
+    UploadJobView,
     UnitLocationListView,
+    RunExportView,
+    PositionExportView,
     AthleteInfoView,
     CoachRateView,
+    metrics_view,
 )
 
 from rest_framework.routers import SimpleRouter
@@ -47,14 +54,21 @@ router.register(r"api/athlete_info", AthleteInfoView, basename="athlete-info")
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/company_details/', get_club_data, name='company-details'),
+    path("api/runs/import/", RunImportView.as_view(), name="run-import"),
     path("api/runs/<int:run_id>/start/", RunStartView.as_view(), name="run-start"),
-    path("api/runs/<int:run_id>/stop/", RunStopView.as_view(), name="run-start"),
+    path("api/runs/<int:run_id>/stop/", RunStopView.as_view(), name="run-stop"),
+    path("api/runs/<int:run_id>/stats/", RunStatsView.as_view(), name="run-stats"),
     path("api/subscribe_to_coach/<int:id>/", SubscribeView.as_view(), name="subscribe-to-coach"),
     path("api/challenges/", ChallengeListView.as_view(), name="challenge-list"),
     path("api/challenges_summary/", ChallengesSummary2.as_view(), name="challenges-summary"),
     path("api/analytics_for_coach/<int:coach_id>/", CoachAnalytics.as_view(), name="coach-analytics"),
+    path("api/leaderboard/", LeaderboardView.as_view(), name="leaderboard"),
     path("api/upload_file/", UploadFileView.as_view(), name="upload-file"),
+    path("api/upload_jobs/<int:pk>/", UploadJobView.as_view(), name="upload-job"),
+    path("api/export/runs/", RunExportView.as_view(), name="export-runs"),
+    path("api/export/positions/", PositionExportView.as_view(), name="export-positions"),
     path("api/collectible_item/", UnitLocationListView.as_view(), name="unit-location"),
     path("api/rate_coach/<int:coach_id>/", CoachRateView.as_view(), name="coach-rate"),
+    path("api/_metrics/", metrics_view, name="metrics"),
     path("", include(router.urls)),
 ]
\ No newline at end of file